@@ -0,0 +1 @@
+#Benchmarks for the per-frame hot paths and level loading, run from the project folder with: python -m benchmarks
@@ -0,0 +1,51 @@
+import sys
+import argparse
+import tempfile
+from simulation import init_display
+from benchmarks.cases import Levels, run_all
+from benchmarks.harness import write_results, load_results, compare
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'python -m benchmarks', description = 'Time the frame hot paths and level loading.')
+    parser.add_argument('--map-scales', type = int, nargs = '+', default = [1, 4, 16], help = 'synthetic map sizes as multiples of the MAP.tmx area')
+    parser.add_argument('--plants', type = int, nargs = '+', default = [10, 100, 1000, 10000], help = 'plant counts for the farming benchmarks')
+    parser.add_argument('--samples', type = int, default = 200, help = 'timed calls per benchmark')
+    parser.add_argument('--load-samples', type = int, default = 3, help = 'timed level loads per map scale')
+    parser.add_argument('--quick', action = 'store_true', help = 'fewer samples and smaller scales, for a fast check')
+    parser.add_argument('--output', default = 'benchmarks/results.json', help = 'where to write the results')
+    parser.add_argument('--baseline', default = 'benchmarks/baseline.json', help = 'results to compare against, if the file exists')
+    parser.add_argument('--save-baseline', action = 'store_true', help = 'also store these results as the new baseline')
+    parser.add_argument('--threshold', type = float, default = 0.2, help = 'allowed median slowdown against the baseline (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.map_scales, args.plants, args.samples, args.load_samples = [1, 4], [10, 100, 1000], 30, 1
+
+    init_display()
+    print(f'{"benchmark":44} {"p50 us":>10} {"p90 us":>10} {"p99 us":>10}')
+    def report(name, stats):
+        print(f'{name:44} {stats["p50_us"]:10.1f} {stats["p90_us"]:10.1f} {stats["p99_us"]:10.1f}')
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        results = run_all(Levels(out_dir), args.map_scales, args.plants, args.samples, args.load_samples, report)
+
+    write_results(args.output, results)
+    print(f'results written to {args.output}')
+    if args.save_baseline:
+        write_results(args.baseline, results)
+        print(f'baseline written to {args.baseline}')
+        return 0
+
+    try:
+        baseline = load_results(args.baseline)
+    except FileNotFoundError:
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, ratio in regressions:
+        print(f'REGRESSION {name}: p50 {before:.1f} us -> {after:.1f} us ({ratio:.2f}x)')
+    if not regressions:
+        print(f'no regressions against {args.baseline}')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import random
+import pygame
+from settings import *
+from level_data import load_level
+from soil import FARMABLE, TILLED
+from benchmarks.harness import measure, summarize
+from benchmarks.maps import scaled_map
+
+class Levels:
+    #Builds one level per map scale on first use and keeps it for every benchmark on that scale
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.paths = {}  #Map scale -> synthetic .tmx
+        self.levels = {}  #Map scale -> Level
+
+    def map_path(self, scale):
+        if scale not in self.paths:
+            self.paths[scale] = scaled_map(scale, self.out_dir)
+            load_level(self.paths[scale]).close()  #Compile now so it is not timed as part of a load
+        return self.paths[scale]
+
+    def get(self, scale):
+        if scale not in self.levels:
+            from spritelayer import Level
+            self.levels[scale] = Level(load_level(self.map_path(scale)), seed = 0)
+        return self.levels[scale]
+
+    def for_tiles(self, tiles, scales = (1, 4, 16, 64, 256)):
+        #Smallest synthetic map with at least that many tiles
+        for scale in scales:
+            level = self.get(scale)
+            if level.level_data.width * level.level_data.height >= tiles:
+                return level
+        raise ValueError(f'no synthetic map has {tiles} tiles')
+
+def world_points(level, count, seed = 0):
+    #Evenly random points inside the world, the same ones on every run
+    rng = random.Random(seed)
+    width, height = level.level_data.width * TILE_SIZE, level.level_data.height * TILE_SIZE
+    return [(rng.randrange(width), rng.randrange(height)) for _ in range(count)]
+
+def place_player(player, pos):
+    player.pos.update(pos)
+    player.hitbox.center = pos
+    player.rect.center = player.hitbox.center
+
+def move_player(level, pos):
+    #Place the player and load the world around it, like a level update does.
+    #The streamed sprites are indexed here too, so the timed call after it doesn't pay for indexing them.
+    place_player(level.player, pos)
+    level.streamer.update(pos)
+    for group in (level.collision_sprites, level.log_sprites, level.rock_sprites, level.grass_sprites,
+                  level.all_sprites, level.all_sprites.static_sprites):
+        group.index_pending()
+
+def map_benchmarks(levels, scale, samples):
+    #Frame hot paths that depend on how big the map is
+    level = levels.get(scale)
+    player = level.player
+    points = world_points(level, samples + 1)
+    results = {}
+
+    #Every sample jumps to a new place, so chunks are loaded and the farthest unloaded each time
+    results[f'streamer.update[map={scale}x]'] = measure(lambda i: level.streamer.update(points[i]), samples,
+                                                        lambda i: place_player(player, points[i]))
+
+    def draw(i):
+        level.all_sprites.custom_draw(player)
+    results[f'custom_draw[map={scale}x]'] = measure(draw, samples, lambda i: move_player(level, points[i]))
+
+    def collide(i):
+        player.collide('horizontal')
+        player.collide('vertical')
+    def before_collide(i):
+        move_player(level, points[i])
+        player.direction.update(1, 1)
+    results[f'player.collide[map={scale}x]'] = measure(collide, samples, before_collide)
+    player.direction.update(0, 0)
+
+    #Aim the axe at the logs, rocks and grass loaded around the spawn, damage only lowers their health until the next update
+    spawn_x, spawn_y = level.level_data.spawn_points['SpawnPoint']
+    move_player(level, (spawn_x * UPSCALE_FACTOR, spawn_y * UPSCALE_FACTOR))
+    targets = [sprite.rect.center for group in (level.log_sprites, level.rock_sprites, level.grass_sprites)
+               for sprite in group]
+    player.selected_tool = 'axe'
+    def aim(i):
+        player.target_pos = pygame.math.Vector2(targets[i % len(targets)])
+    results[f'player.use_tool[map={scale}x]'] = measure(lambda i: player.use_tool(), samples, aim)
+
+    return results
+
+def load_benchmarks(levels, scale, samples):
+    from spritelayer import Level
+    path = levels.map_path(scale)
+    return {f'level_load[map={scale}x]': measure(lambda i: Level(load_level(path), seed = 0), samples)}
+
+def plant_benchmarks(levels, count, samples):
+    #Farming paths with count plants on the field, on the smallest map that fits them
+    level = levels.for_tiles(count + 2)
+    soil_layer = level.soil_layer
+    grid = soil_layer.grid
+    width = grid.width
+
+    #Till a block of tiles and plant all but the last one, the tile after the block is only farmable
+    field = [(index % width, index // width) for index in range(count + 2)]
+    for x, y in field[:-1]:
+        grid.set(x, y, FARMABLE | TILLED)
+    grid.set(*field[-1], FARMABLE)
+    soil_layer.create_soil_tiles()
+    for x, y in field[:count]:
+        soil_layer.plant_seed(tile_center(x, y), 'Seed')
+    empty_soil, untilled = field[count], field[count + 1]
+    results = {}
+
+    def till(i):
+        soil_layer.get_hit(tile_center(*untilled))
+    def untill(i):
+        grid.clear(*untilled, TILLED)
+        sprite = soil_layer.soil_tiles.pop(untilled, None)
+        if sprite:
+            sprite.kill()
+    results[f'soil.get_hit[plants={count}]'] = measure(till, samples, untill)
+
+    results[f'soil.water[plants={count}]'] = measure(lambda i: soil_layer.water(tile_center(*field[0])), samples,
+                                                     lambda i: soil_layer.remove_water())
+    soil_layer.remove_water()
+
+    def plant(i):
+        soil_layer.plant_seed(tile_center(*empty_soil), 'Seed')
+    def unplant(i):
+        plant = soil_layer.plants.get(empty_soil)
+        if plant:
+            plant.kill()
+            soil_layer.remove_plant(*empty_soil)
+    results[f'soil.plant_seed[plants={count}]'] = measure(plant, samples, unplant)
+    unplant(0)
+
+    results[f'soil.create_soil_tiles[plants={count}]'] = measure(lambda i: soil_layer.create_soil_tiles(), samples)
+
+    place_player(level.player, tile_center(*field[0]))
+    results[f'level.plant_collision[plants={count}]'] = measure(lambda i: level.plant_collision(), samples)
+
+    #Water the whole field, the clock moves so every plant grows one stage over the samples
+    for x, y in field[:count]:
+        soil_layer.water(tile_center(x, y))
+    results[f'soil.update[plants={count}]'] = measure(lambda i: soil_layer.update(), samples,
+                                                      lambda i: level.clock.advance(GROWTH_TIME / samples))
+    soil_layer.remove_water()
+
+    #Leave the level as it was for the next plant count
+    for (x, y), plant in list(soil_layer.plants.items()):
+        plant.kill()
+        soil_layer.remove_plant(x, y)
+    for x, y in field:
+        grid.clear(x, y, FARMABLE | TILLED)
+        sprite = soil_layer.soil_tiles.pop((x, y), None)
+        if sprite:
+            sprite.kill()
+    return results
+
+def tile_center(x, y):
+    return (x * TILE_SIZE + TILE_SIZE // 2, y * TILE_SIZE + TILE_SIZE // 2)
+
+def run_all(levels, map_scales, plant_counts, samples, load_samples, on_result = None):
+    #Run every benchmark and return name -> latency statistics
+    results = {}
+    def add(times_by_name):
+        for name, times in times_by_name.items():
+            results[name] = summarize(times)
+            if on_result:
+                on_result(name, results[name])
+
+    for scale in map_scales:
+        add(map_benchmarks(levels, scale, samples))
+        add(load_benchmarks(levels, scale, load_samples))
+    for count in plant_counts:
+        add(plant_benchmarks(levels, count, samples))
+    return results
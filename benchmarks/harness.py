@@ -0,0 +1,68 @@
+import json
+import os
+import platform
+from time import perf_counter_ns
+
+def measure(func, samples, setup = None, warmup = 1):
+    #Time func(i) for every sample i, setup(i) runs before each call and is not timed.
+    #The warmup calls fill caches (baked chunks, scaled images) and are left out of the results.
+    times = []
+    for i in range(warmup + samples):
+        if setup:
+            setup(i)
+        start = perf_counter_ns()
+        func(i)
+        elapsed = perf_counter_ns() - start
+        if i >= warmup:
+            times.append(elapsed)
+    return times
+
+def percentile(ordered, fraction):
+    #Nearest-rank percentile of an already sorted list
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def summarize(times):
+    #Per-call latency statistics in microseconds
+    ordered = sorted(times)
+    return {
+        'samples': len(ordered),
+        'mean_us': sum(ordered) / len(ordered) / 1000,
+        'min_us': ordered[0] / 1000,
+        'p50_us': percentile(ordered, 0.50) / 1000,
+        'p90_us': percentile(ordered, 0.90) / 1000,
+        'p99_us': percentile(ordered, 0.99) / 1000,
+        'max_us': ordered[-1] / 1000,
+    }
+
+def machine_info():
+    #Stored with the results, numbers from different machines should not be compared
+    import pygame
+    return {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
+
+def write_results(path, results):
+    #Write to a temporary file first so an interrupted run never leaves half a file behind
+    with open(path + '.tmp', 'w') as file:
+        json.dump({'machine': machine_info(), 'results': results}, file, indent = 2, sort_keys = True)
+    os.replace(path + '.tmp', path)
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)['results']
+
+def compare(results, baseline, threshold):
+    #Benchmarks whose median got slower than the baseline by more than threshold (0.2 = 20%)
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base and base['p50_us'] > 0:
+            ratio = stats['p50_us'] / base['p50_us']
+            if ratio > 1 + threshold:
+                regressions.append((name, base['p50_us'], stats['p50_us'], ratio))
+    return regressions
@@ -0,0 +1,57 @@
+import os
+import xml.etree.ElementTree as ElementTree
+from settings import *
+from level_data import read_layer_data
+
+def scaled_map(factor, out_dir, tmx_path = MAP_FILE):
+    #Write a synthetic map with factor times the area of tmx_path by repeating it in a square grid.
+    #Every copy keeps its tiles and objects, named spawn points stay only in the first copy.
+    repeat = round(factor ** 0.5)
+    if repeat * repeat != factor:
+        raise ValueError(f'map scale must be a square number, got {factor}')
+
+    root = ElementTree.parse(tmx_path).getroot()
+    width, height = int(root.get('width')), int(root.get('height'))
+    tile_width, tile_height = int(root.get('tilewidth')), int(root.get('tileheight'))
+    map_dir = os.path.dirname(os.path.abspath(tmx_path))
+    root.set('width', str(width * repeat))
+    root.set('height', str(height * repeat))
+
+    #The new map lives in another folder, so tileset and image paths are made absolute
+    for node in root.iter():
+        if node.tag in ('tileset', 'image') and node.get('source'):
+            node.set('source', os.path.join(map_dir, node.get('source')))
+
+    for layer in root.findall('layer'):
+        layer.set('width', str(width * repeat))
+        layer.set('height', str(height * repeat))
+        data = layer.find('data')
+        gids = read_layer_data(data, width * height, tmx_path)
+        rows = []
+        for y in range(height * repeat):
+            row = gids[(y % height) * width:(y % height + 1) * width]
+            rows.append(','.join(map(str, row * repeat)))
+        data.attrib = {'encoding': 'csv'}
+        data.text = '\n' + ',\n'.join(rows) + '\n'
+
+    next_id = int(root.get('nextobjectid', 1))
+    for group in root.findall('objectgroup'):
+        originals = group.findall('object')
+        for copy_y in range(repeat):
+            for copy_x in range(repeat):
+                if copy_x == copy_y == 0:
+                    continue
+                for obj in originals:
+                    is_spawn = not obj.get('gid') and not obj.get('width') and not obj.get('height')
+                    if is_spawn:
+                        continue
+                    copy = ElementTree.SubElement(group, 'object', dict(obj.attrib))
+                    copy.set('id', str(next_id))
+                    copy.set('x', str(float(obj.get('x', 0)) + copy_x * width * tile_width))
+                    copy.set('y', str(float(obj.get('y', 0)) + copy_y * height * tile_height))
+                    next_id += 1
+    root.set('nextobjectid', str(next_id))
+
+    path = os.path.join(out_dir, f'MAP_x{factor}.tmx')
+    ElementTree.ElementTree(root).write(path, encoding = 'UTF-8', xml_declaration = True)
+    return path
@@ -0,0 +1,163 @@
+import pygame
+from collections import OrderedDict
+from settings import *
+from spatial import PendingIndex
+
+#ChunkCache keeps baked chunk surfaces up to a fixed count, the least recently used one is dropped first.
+#bake(key) makes the surface of a chunk that is not in the cache.
+class ChunkCache:
+    def __init__(self, bake, size = STATIC_CHUNK_CACHE_SIZE):
+        self.bake = bake
+        self.size = size #Maximum number of surfaces kept in memory
+        self.surfaces = OrderedDict() #Key -> baked surface, least recently used first
+
+    def get(self, key):
+        surf = self.surfaces.get(key)
+        if surf is None:
+            surf = self.bake(key)
+            self.surfaces[key] = surf
+            if len(self.surfaces) > self.size:
+                self.surfaces.popitem(last = False) #Evict the least recently used chunk
+        else:
+            self.surfaces.move_to_end(key)
+        return surf
+
+    def discard(self, key):
+        self.surfaces.pop(key, None)
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def __len__(self):
+        return len(self.surfaces)
+
+#StaticChunkGroup holds sprites that never move or animate (map image, decorations, fences).
+#Instead of blitting them one by one every frame, they are pre-rendered into fixed-size chunk surfaces.
+#Sprites are registered under their chunks on the next draw, once their z is set.
+class StaticChunkGroup(PendingIndex, pygame.sprite.Group):
+    def __init__(self, chunk_size = STATIC_CHUNK_SIZE, cache_size = STATIC_CHUNK_CACHE_SIZE):
+        super().__init__()
+        self.chunk_size = chunk_size #Width and height of a chunk in world pixels
+
+        self.chunk_sprites = {} #(layer, chunk_x, chunk_y) -> static sprites overlapping that chunk
+        self.layers = set() #Layers that have at least one static sprite
+        self.baked = ChunkCache(self.bake, cache_size) #(layer, chunk_x, chunk_y) -> baked surface
+
+    def index(self, sprite):
+        cols, rows = self.chunk_range(sprite.rect)
+        keys = [(sprite.z, x, y) for y in rows for x in cols]
+        for key in keys:
+            self.chunk_sprites.setdefault(key, {})[sprite] = None
+            self.baked.discard(key)
+        self.layers.add(sprite.z)
+        return keys
+
+    def unindex(self, sprite, keys):
+        for key in keys:
+            del self.chunk_sprites[key][sprite]
+            self.baked.discard(key) #Chunk has to be baked again without this sprite
+
+    def chunk_range(self, rect):
+        #Chunk coordinates covered by a world rect
+        size = self.chunk_size
+        return (range(rect.left // size, (rect.right - 1) // size + 1),
+                range(rect.top // size, (rect.bottom - 1) // size + 1))
+
+    def invalidate(self, rect = None):
+        #Drop baked chunks touching rect (or all of them), used when a static sprite changes in place
+        if rect is None:
+            self.baked.clear()
+            return
+        cols, rows = self.chunk_range(rect)
+        for layer in self.layers:
+            for y in rows:
+                for x in cols:
+                    self.baked.discard((layer, x, y))
+
+    def bake(self, key):
+        _, chunk_x, chunk_y = key
+        left, top = chunk_x * self.chunk_size, chunk_y * self.chunk_size
+        surf = pygame.Surface((self.chunk_size, self.chunk_size), pygame.SRCALPHA)
+
+        sprites = self.chunk_sprites[key]
+        if key[0] in Y_SORT_LAYERS:
+            sprites = sorted(sprites, key = lambda sprite: sprite.rect.centery)
+        surf.blits([(sprite.image, sprite.rect.move(-left, -top)) for sprite in sprites], False)
+        return surf
+
+    def draw_layer(self, surface, layer, view_rect):
+        #Blit the baked chunks of a layer that are inside the camera view
+        if layer not in self.layers:
+            return
+        cols, rows = self.chunk_range(view_rect)
+        blits = []
+        for y in rows:
+            for x in cols:
+                key = (layer, x, y)
+                if self.chunk_sprites.get(key):
+                    blits.append((self.baked.get(key), (x * self.chunk_size - view_rect.x, y * self.chunk_size - view_rect.y)))
+        surface.blits(blits, False)
+
+    def occluders(self, layer, rect):
+        #Static sprites of a y-sorted layer overlapping rect, in draw order.
+        #Used to redraw the ones in front of a moving sprite after it is drawn over the baked chunk.
+        if layer not in self.layers:
+            return []
+        cols, rows = self.chunk_range(rect)
+        found = {}
+        for y in rows:
+            for x in cols:
+                for sprite in self.chunk_sprites.get((layer, x, y), ()):
+                    if sprite.rect.colliderect(rect):
+                        found[sprite] = None
+        return sorted(found, key = lambda sprite: sprite.rect.centery)
+
+#WaterLayer replaces one animated sprite per water tile with a single object and one animation clock.
+#Every frame of the water animation is pre-composed per chunk, so drawing water costs a few blits.
+class WaterLayer:
+    def __init__(self, tiles, frames, chunk_size = STATIC_CHUNK_SIZE, cache_size = STATIC_CHUNK_CACHE_SIZE):
+        self.frames = frames #Water animation frames, shared by every tile
+        self.frame_index = 0 #Shared clock, all water tiles show the same frame
+        self.z = LAYERS['Water'] #Layer for the order of rendering
+        self.chunk_size = chunk_size
+        self.tiles_per_chunk = chunk_size // TILE_SIZE
+
+        #Which tiles of each chunk are water, chunks with the same layout share their baked surfaces
+        self.chunk_masks = {}
+        for x, y in tiles:
+            chunk = (x // self.tiles_per_chunk, y // self.tiles_per_chunk)
+            mask = self.chunk_masks.setdefault(chunk, bytearray(self.tiles_per_chunk * self.tiles_per_chunk))
+            mask[(y % self.tiles_per_chunk) * self.tiles_per_chunk + x % self.tiles_per_chunk] = 1
+        self.chunk_masks = {chunk: bytes(mask) for chunk, mask in self.chunk_masks.items()}
+        self.baked = ChunkCache(self.bake, cache_size) #(frame, mask) -> composed surface
+
+    def update(self, dt):
+        #Same timing as the old per-tile animation
+        self.frame_index += 5 * dt
+        if self.frame_index >= len(self.frames):
+            self.frame_index = 0
+
+    def bake(self, key):
+        frame, mask = key
+        surf = pygame.Surface((self.chunk_size, self.chunk_size), pygame.SRCALPHA)
+        image = self.frames[frame]
+        blits = []
+        for index, is_water in enumerate(mask):
+            if is_water:
+                row, col = divmod(index, self.tiles_per_chunk)
+                blits.append((image, (col * TILE_SIZE, row * TILE_SIZE)))
+        surf.blits(blits, False)
+        return surf
+
+    def draw_layer(self, surface, layer, view_rect):
+        if layer != self.z:
+            return
+        frame = int(self.frame_index)
+        size = self.chunk_size
+        blits = []
+        for y in range(view_rect.top // size, (view_rect.bottom - 1) // size + 1):
+            for x in range(view_rect.left // size, (view_rect.right - 1) // size + 1):
+                mask = self.chunk_masks.get((x, y))
+                if mask:
+                    blits.append((self.baked.get((frame, mask)), (x * size - view_rect.x, y * size - view_rect.y)))
+        surface.blits(blits, False)
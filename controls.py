@@ -0,0 +1,75 @@
+import pygame
+from settings import *
+
+#InputManager turns keyboard events into game actions (names from KEY_BINDINGS).
+#Every action is sent once as 'press' and once as 'release', and as 'repeat' while it stays held.
+#Subscribers get the actions of the context the game is in (playing, shop or instructions),
+#and the held state is kept for continuous input like walking.
+class InputManager:
+    def __init__(self, context, repeat_delay = INPUT_REPEAT_DELAY, repeat_interval = INPUT_REPEAT_INTERVAL):
+        self.context = context #Returns the current context name, checked for every action sent
+        self.repeat_delay = repeat_delay #Seconds an action is held before it repeats
+        self.repeat_interval = repeat_interval #Seconds between repeats
+
+        self.actions = {key: action for action, key in KEY_BINDINGS.items()} #Key -> action
+        self.held = {} #Held action -> seconds until it repeats next
+        self.queue = [] #(action, kind) waiting to be sent on the next dispatch
+        self.subscribers = {} #Context -> callbacks taking (action, kind)
+        self.recorder = None #Called with (action, pressed) for every press and release, to record a session
+
+    def subscribe(self, context, callback):
+        self.subscribers.setdefault(context, []).append(callback)
+
+    def handle_event(self, event):
+        #Feed a pygame event, keys that are not bound to an action are ignored
+        if event.type == pygame.KEYDOWN and event.key in self.actions:
+            self.press(self.actions[event.key])
+        elif event.type == pygame.KEYUP and event.key in self.actions:
+            self.release(self.actions[event.key])
+        elif event.type == pygame.WINDOWFOCUSLOST:
+            self.release_all() #Keys let go in another window never send KEYUP here
+
+    def press(self, action):
+        if action not in self.held:
+            self.held[action] = self.repeat_delay
+            self.queue.append((action, 'press'))
+            if self.recorder:
+                self.recorder(action, True)
+
+    def release(self, action):
+        if self.held.pop(action, None) is not None:
+            self.queue.append((action, 'release'))
+            if self.recorder:
+                self.recorder(action, False)
+
+    def release_all(self):
+        for action in list(self.held):
+            self.release(action)
+
+    def set_actions(self, actions):
+        #Hold exactly these actions, for scripted input: new ones are pressed, missing ones released
+        for action in [action for action in self.held if action not in actions]:
+            self.release(action)
+        for action in actions:
+            self.press(action)
+
+    def is_held(self, action):
+        return action in self.held
+
+    def dispatch(self, dt):
+        #Send the queued actions, then repeats for the actions held long enough
+        queue, self.queue = self.queue, []
+        for action, kind in queue:
+            self.send(action, kind)
+
+        for action in list(self.held):
+            remaining = self.held[action] - dt
+            if remaining <= 0:
+                remaining += self.repeat_interval
+                self.send(action, 'repeat')
+            if action in self.held: #A subscriber may have released it
+                self.held[action] = remaining
+
+    def send(self, action, kind):
+        for callback in self.subscribers.get(self.context(), ()):
+            callback(action, kind)
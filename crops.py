@@ -0,0 +1,103 @@
+import heapq
+from array import array
+from settings import *
+
+#CropField grows every planted crop over game time while its tile is watered.
+#Crop state lives in parallel arrays indexed by slot, and the time each growing crop reaches its
+#next stage is kept in a heap, so an update only touches the crops that change stage.
+class CropField:
+    def __init__(self, clock, max_age, stage_time = GROWTH_TIME * 1000):
+        self.clock = clock #GameClock of the level, crops grow over its time
+        self.max_age = max_age #Last growth stage, the crop can be harvested there
+        self.stage_time = stage_time #Watered game time in milliseconds to grow one stage
+
+        #Crop state by slot
+        self.age = array('B') #Growth stage
+        self.progress = array('d') #Watered time already spent on the current stage
+        self.watered_since = array('d') #Game time the current watering began, -1 while dry
+        self.generation = array('L') #Changes whenever a scheduled stage change is no longer valid
+        self.plants = [] #Plant sprite of each slot, None for free slots and crops that are not loaded
+
+        self.free = [] #Slots of removed crops, reused first
+        self.growing = set() #Slots of watered crops that are not fully grown
+        self.due = [] #Heap of (time of the next stage, slot, generation)
+
+    def add(self, plant, watered = False, age = 0, progress = 0):
+        if self.free:
+            slot = self.free.pop()
+            self.age[slot] = age
+            self.progress[slot], self.watered_since[slot] = progress, -1
+        else:
+            slot = len(self.plants)
+            self.age.append(age)
+            self.progress.append(progress)
+            self.watered_since.append(-1)
+            self.generation.append(0)
+            self.plants.append(None)
+        self.attach(slot, plant)
+        if watered:
+            self.water(slot)
+        return slot
+
+    def attach(self, slot, plant):
+        #Plant sprite showing the crop, None while its part of the world is unloaded, the crop grows on anyway
+        self.plants[slot] = plant
+        if plant:
+            plant.slot = slot
+
+    def remove(self, slot):
+        self.dry(slot)
+        self.generation[slot] += 1
+        self.plants[slot] = None
+        self.free.append(slot)
+
+    def water(self, slot):
+        #Start growing, the time already grown on the current stage is kept
+        if slot in self.growing or self.age[slot] >= self.max_age:
+            return
+        now = self.clock.ticks
+        self.watered_since[slot] = now
+        self.growing.add(slot)
+        heapq.heappush(self.due, (now + self.stage_time - self.progress[slot], slot, self.generation[slot]))
+
+    def grown(self, slot):
+        #Watered time spent on the current stage so far
+        if slot in self.growing:
+            return self.progress[slot] + self.clock.ticks - self.watered_since[slot]
+        return self.progress[slot]
+
+    def dry(self, slot):
+        #Stop growing and remember how far the current stage got
+        if slot in self.growing:
+            self.progress[slot] += self.clock.ticks - self.watered_since[slot]
+            self.watered_since[slot] = -1
+            self.generation[slot] += 1 #Its scheduled stage change is cancelled
+            self.growing.discard(slot)
+
+    def dry_all(self):
+        for slot in list(self.growing):
+            self.dry(slot)
+
+    def update(self):
+        #Advance every crop whose next stage is due, then swap the frames of only those plants
+        now = self.clock.ticks
+        due = self.due
+        changed = []
+        while due and due[0][0] <= now:
+            time, slot, generation = heapq.heappop(due)
+            if generation != self.generation[slot]:
+                continue #Dried or removed since it was scheduled
+            self.age[slot] += 1
+            self.progress[slot] = 0
+            if self.age[slot] < self.max_age:
+                self.watered_since[slot] = time #Next stage counts from when this one finished
+                heapq.heappush(due, (time + self.stage_time, slot, generation))
+            else:
+                self.watered_since[slot] = -1
+                self.growing.discard(slot)
+            changed.append(slot)
+
+        for slot in changed:
+            if self.plants[slot]:
+                self.plants[slot].set_age(self.age[slot])
+        return changed
@@ -1,7 +1,7 @@
 import pygame
 from settings import *
-from timer import Timer
 from ui import *
+from support import import_image
 
 class Instructions:
     def __init__(self, player, toggle_instructions):
@@ -10,28 +10,31 @@ class Instructions:
         self.toggle_instructions = toggle_instructions  #Function to toggle instructions visibility
         self.display_surface = pygame.display.get_surface()  #Get the current display surface
 
-        # Load the instruction image
-        self.instruction_image = pygame.image.load('instruction.jpg').convert_alpha()  #Load and convert the instruction image
+        # The instruction image is loaded the first time it is drawn
+        self.instruction_image = None
+        self.image_rect = None
+
+    def load_image(self):
+        self.instruction_image = import_image('instruction.jpg')  #Load and convert the instruction image
         self.image_rect = self.instruction_image.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))  #Center the image
 
-    def input(self):
-        keys = pygame.key.get_pressed()  #Get the current state of all keyboard keys
-        if keys[pygame.K_ESCAPE]:  
+    def on_action(self, action, kind):
+        if action == 'close' and kind == 'press':
             self.toggle_instructions()  #Call the toggle function to hide instructions
 
-    def update(self):
-        self.input()  #Check for input every frame
-
     def draw(self):
+        if self.instruction_image is None:
+            self.load_image()
         self.display_surface.blit(self.instruction_image, self.image_rect)  #Draw the instruction image on the display surface
 
 class Menu:
-    def __init__(self, player, toggle_menu):
+    def __init__(self, player, toggle_menu, controls):
         # General setup
         self.player = player  #Reference to the player object
+        self.controls = controls  #Actions from the keyboard or injected input, sent to on_action while the shop is open
         self.toggle_menu = toggle_menu  #Function to toggle menu visibility
         self.display_surface = pygame.display.get_surface()  #Get the current display surface
-        self.font = pygame.font.Font('font/LycheeSoda.ttf', 30)  #Load the font for menu text
+        self.font = None  #Font for menu text, loaded with the text surfaces the first time the menu is shown
 
         # Options
         self.width = 400  #Width of the menu
@@ -41,17 +44,23 @@ class Menu:
         # Entries
         self.options = list(self.player.item_inventory.keys()) + list(self.player.seed_inventory.keys())  #Combine item and seed inventories into options
         self.sell_border = len(self.player.item_inventory) - 1  #Index to differentiate between sell and buy options
-        self.setup()  #Call setup to initialize text surfaces
+        self.text_surfs = None  #Text surfaces, created by setup on first use
+
+        # Menu panel, composed again only when the selection or an amount changes
+        self.panel_surf = None
+        self.panel_key = None
 
         # Movement
         self.index = 0  #Current selected index in the menu
-        self.timer = Timer(200)  #Timer to control input delay
 
         # Instruction toggle
         self.show_instructions = False  #Flag to show/hide instructions
         self.instructions = Instructions(self.player, self.toggle_instructions)  #Create an Instructions object
+        controls.subscribe('shop', self.on_action)
 
     def setup(self):
+        self.font = pygame.font.Font('font/LycheeSoda.ttf', 30)  #Load the font for menu text
+
         #Create the text surfaces for each menu option
         self.text_surfs = []  #List to hold text surfaces
         self.total_height = 0  #Total height of the menu
@@ -68,41 +77,34 @@ class Menu:
         # Buy / sell text surfaces
         self.buy_text = self.font.render('buy', False, 'Black')  #Render 'buy' text
         self.sell_text = self.font.render('sell', False, 'Black')  #Render 'sell' text
+        self.amount_text = TextCache(self.font, 'Black', False)  #Amount strings already rendered
 
-    def input(self):
-        keys = pygame.key.get_pressed()  #Get the current state of all keyboard keys
-        self.timer.update()  #Update the timer
-
-        if keys[pygame.K_ESCAPE]:  #Press 'ESC' to close the menu
+    def input(self, action):
+        if action == 'close':  #Press 'ESC' to close the menu
             self.toggle_menu()  #Call the toggle function to hide the menu
 
-        if not self.timer.active:  
-            if keys[pygame.K_w]: 
-                self.index -= 1  
-                self.timer.activate()  #Activate the timer to prevent rapid input
+        if action == 'up':
+            self.index -= 1
 
-            if keys[pygame.K_s]: 
-                self.index += 1 
-                self.timer.activate()  # Activate the timer
+        if action == 'down':
+            self.index += 1
 
-            if keys[pygame.K_SPACE]:  
-                self.timer.activate()  # Activate the timer
+        if action == 'tool':
+            #Get the currently selected item
+            current_item = self.options[self.index]
 
-                #Get the currently selected item
-                current_item = self.options[self.index]
+            #Sell item logic
+            if self.index <= self.sell_border:  #Check if the selected index is for selling
+                if self.player.item_inventory[current_item] > 0:  #Ensure the player has the item to sell
+                    self.player.item_inventory[current_item] -= 1  #Decrease the item count
+                    self.player.money += SALE_PRICES[current_item]  #Increase player's money by sale price
 
-                #Sell item logic
-                if self.index <= self.sell_border:  #Check if the selected index is for selling
-                    if self.player.item_inventory[current_item] > 0:  #Ensure the player has the item to sell
-                        self.player.item_inventory[current_item] -= 1  #Decrease the item count
-                        self.player.money += SALE_PRICES[current_item]  #Increase player's money by sale price
-
-                # Buy item logic
-                else:  #Buying seeds
-                    seed_price = PURCHASE_PRICES[current_item]  #Get the price of the seed
-                    if self.player.money >= seed_price:  #Check if the player has enough money
-                        self.player.seed_inventory[current_item] += 1  #Increase the seed count
-                        self.player.money -= seed_price  #Decrease player's money by seed price
+            # Buy item logic
+            else:  #Buying seeds
+                seed_price = PURCHASE_PRICES[current_item]  #Get the price of the seed
+                if self.player.money >= seed_price:  #Check if the player has enough money
+                    self.player.seed_inventory[current_item] += 1  #Increase the seed count
+                    self.player.money -= seed_price  #Decrease player's money by seed price
 
         #Wrap the index to allow circular navigation
         if self.index < 0:  # If index goes below 0
@@ -113,49 +115,54 @@ class Menu:
     def toggle_instructions(self):
         self.show_instructions = not self.show_instructions  # Toggle the visibility of instructions
 
-    def show_entry(self, text_surf, amount, top, selected):
-        # Draw the background for the menu entry
-        bg_rect = pygame.Rect(self.main_rect.left, top, self.width, text_surf.get_height() + (self.padding * 2))  # Create a rectangle for the entry background
-        pygame.draw.rect(self.display_surface, 'White', bg_rect, 0, 4)  # Draw the background rectangle
+    def show_entry(self, surface, text_surf, amount, top, selected):
+        # Entries are drawn on the panel surface, so positions are relative to the panel
+        bg_rect = pygame.Rect(0, top, self.width, text_surf.get_height() + (self.padding * 2))  # Create a rectangle for the entry background
+        pygame.draw.rect(surface, 'White', bg_rect, 0, 4)  # Draw the background rectangle
 
         # Draw the text for the entry
-        text_rect = text_surf.get_rect(midleft=(self.main_rect.left + 20, bg_rect.centery))  # Position the text
-        self.display_surface.blit(text_surf, text_rect)  # Draw the text surface
+        text_rect = text_surf.get_rect(midleft=(20, bg_rect.centery))  # Position the text
+        surface.blit(text_surf, text_rect)  # Draw the text surface
 
         # Draw the amount of the item
-        amount_surf = self.font.render(str(amount), False, 'Black')  # Render the amount text
-        amount_rect = amount_surf.get_rect(midright=(self.main_rect.right - 20, bg_rect.centery))  # Position the amount text
-        self.display_surface.blit(amount_surf, amount_rect)  # Draw the amount surface
+        amount_surf = self.amount_text.render(str(amount))  # Amount text, rendered once per value
+        amount_rect = amount_surf.get_rect(midright=(self.width - 20, bg_rect.centery))  # Position the amount text
+        surface.blit(amount_surf, amount_rect)  # Draw the amount surface
 
         # Highlight the selected entry
         if selected:  # If this entry is selected
-            pygame.draw.rect(self.display_surface, 'black', bg_rect, 4, 4)  # Draw a border around the selected entry
+            pygame.draw.rect(surface, 'black', bg_rect, 4, 4)  # Draw a border around the selected entry
             if self.index <= self.sell_border:  # If selling
-                pos_rect = self.sell_text.get_rect(midleft=(self.main_rect.left + 150, bg_rect.centery))  # Position the sell text
-                self.display_surface.blit(self.sell_text, pos_rect)  # Draw the sell text
+                pos_rect = self.sell_text.get_rect(midleft=(150, bg_rect.centery))  # Position the sell text
+                surface.blit(self.sell_text, pos_rect)  # Draw the sell text
             else:  # If buying
-                pos_rect = self.buy_text.get_rect(midleft=(self.main_rect.left + 150, bg_rect.centery))  # Position the buy text
-                self.display_surface.blit(self.buy_text, pos_rect)  # Draw the buy text
-
-    def update(self):
-        if self.show_instructions:  # If instructions are to be shown
-            self.instructions.update()  # Update the instructions
-        else:  # Otherwise, update the menu input
-            self.input()
+                pos_rect = self.buy_text.get_rect(midleft=(150, bg_rect.centery))  # Position the buy text
+                surface.blit(self.buy_text, pos_rect)  # Draw the buy text
 
-        # Draw each entry in the menu
+    def compose_panel(self, amounts):
+        # Draw every entry onto one transparent surface the size of the menu
+        panel = pygame.Surface(self.main_rect.size, pygame.SRCALPHA)
         for text_index, text_surf in enumerate(self.text_surfs):
-            top = self.main_rect.top + text_index * (text_surf.get_height() + (self.padding * 2) + self.space)  # Calculate the top position for each entry
-            amount_list = list(self.player.item_inventory.values()) + list(self.player.seed_inventory.values())  # Get the amounts for each item
-            amount = amount_list[text_index]  # Get the amount for the current entry
-            self.show_entry(text_surf, amount, top, self.index == text_index)  # Show the entry
+            top = text_index * (text_surf.get_height() + (self.padding * 2) + self.space)  # Calculate the top position for each entry
+            self.show_entry(panel, text_surf, amounts[text_index], top, self.index == text_index)  # Show the entry
+        return panel
+
+    def on_action(self, action, kind):
+        if self.show_instructions:  # If instructions are to be shown
+            self.instructions.on_action(action, kind)  # They get the input
+        elif kind == 'press' or (kind == 'repeat' and action != 'close'):  # Holding a key scrolls or trades again
+            self.input(action)
 
     def draw(self):
+        if self.text_surfs is None:  # First time the menu is shown
+            self.setup()
+
         if self.show_instructions:  # If instructions are to be shown
             self.instructions.draw()  # Draw the instructions
-        else:  # Otherwise, draw the menu entries
-            for text_index, text_surf in enumerate(self.text_surfs):
-                top = self.main_rect.top + text_index * (text_surf.get_height() + (self.padding * 2) + self.space)  # Calculate the top position for each entry
-                amount_list = list(self.player.item_inventory.values()) + list(self.player.seed_inventory.values())  # Get the amounts for each item
-                amount = amount_list[text_index]  # Get the amount for the current entry
-                self.show_entry(text_surf, amount, top, self.index == text_index)  # Show the entry
\ No newline at end of file
+        else:  # Otherwise, draw the menu panel
+            amounts = tuple(self.player.item_inventory.values()) + tuple(self.player.seed_inventory.values())  # Amount of each entry
+            key = (self.index, amounts)
+            if key != self.panel_key:  # Selection or an amount changed since the panel was composed
+                self.panel_surf = self.compose_panel(amounts)
+                self.panel_key = key
+            self.display_surface.blit(self.panel_surf, self.main_rect)  # Draw the whole menu in one blit
@@ -0,0 +1,279 @@
+import os
+import sys
+import mmap
+import struct
+import pygame
+from array import array
+from settings import *
+from support import import_image
+
+#The game's binary files (compiled levels, saves and recordings) start with a 4-byte magic and a
+#format version. The version is bumped whenever the layout after it changes, and a file of another
+#version is never read. An out of date compiled level is simply compiled again.
+LEVEL_MAGIC = b'SSLV'
+LEVEL_FORMAT_VERSION = 1
+
+#magic, version, map width, map height, tile width, tile height,
+#number of tilesets, tile layers, object groups and spawn points
+HEADER = struct.Struct('<4sHHHHHHHHH')
+TILESET = struct.Struct('<IHHHHHH')  #firstgid, tile count, columns, tile width, tile height, margin, spacing
+LAYER = struct.Struct('<I')  #offset of the layer's gid array in the file
+OBJECT_GROUP = struct.Struct('<I')  #number of objects
+OBJECT = struct.Struct('<IIdddd')  #id, gid, x, y, width, height
+SPAWN = struct.Struct('<dd')  #x, y
+STRING = struct.Struct('<H')  #byte length of the utf-8 string that follows
+
+GID_MASK = 0x1FFFFFFF  #Tiled stores flip flags in the top bits of a gid, flipped tiles are drawn unflipped
+
+class LevelObject:
+    #An object of an object group, positions are in map pixels with (x, y) at the top left like pytmx
+    def __init__(self, level, id, name, gid, x, y, width, height):
+        self.level = level
+        self.id = id
+        self.name = name
+        self.gid = gid
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def get_image(self, scale = 1):
+        #Tile image scaled by a whole factor, shared with every tile and object of the same gid
+        return self.level.get_tile_image(self.gid, scale) if self.gid else None
+
+class LevelData:
+    #A compiled level read through mmap, tile layers are views into the file and are not copied
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        self.view = memoryview(self.buffer)
+        self.tile_images = {}  #(gid, scale) -> tile surface, sliced from its tileset and scaled on first use
+
+        magic, version, self.width, self.height, self.tile_width, self.tile_height, \
+            tileset_count, layer_count, group_count, spawn_count = HEADER.unpack_from(self.buffer, 0)
+        if magic != LEVEL_MAGIC or version != LEVEL_FORMAT_VERSION:
+            raise ValueError(f'{path} is not a level file of version {LEVEL_FORMAT_VERSION}')
+        offset = HEADER.size
+
+        #Tilesets, each with the .tsx it came from and its image
+        self.tilesets = []
+        for _ in range(tileset_count):
+            firstgid, tilecount, columns, tile_width, tile_height, margin, spacing = TILESET.unpack_from(self.buffer, offset)
+            offset += TILESET.size
+            source, offset = self.read_string(offset)
+            image, offset = self.read_string(offset)
+            self.tilesets.append((firstgid, tilecount, columns, tile_width, tile_height, margin, spacing, source, image))
+
+        #Tile layers, one gid per tile row by row
+        self.layers = {}
+        tile_count = self.width * self.height
+        for _ in range(layer_count):
+            name, offset = self.read_string(offset)
+            data_offset, = LAYER.unpack_from(self.buffer, offset)
+            offset += LAYER.size
+            data = self.view[data_offset:data_offset + tile_count * 4]
+            if sys.byteorder == 'little':
+                self.layers[name] = data.cast('I')
+            else:
+                self.layers[name] = array('I', data)
+                self.layers[name].byteswap()
+
+        #Object groups
+        self.object_groups = {}
+        for _ in range(group_count):
+            group_name, offset = self.read_string(offset)
+            count, = OBJECT_GROUP.unpack_from(self.buffer, offset)
+            offset += OBJECT_GROUP.size
+            objects = []
+            for _ in range(count):
+                id, gid, x, y, width, height = OBJECT.unpack_from(self.buffer, offset)
+                offset += OBJECT.size
+                name, offset = self.read_string(offset)
+                objects.append(LevelObject(self, id, name, gid, x, y, width, height))
+            self.object_groups[group_name] = objects
+
+        #Spawn points by name
+        self.spawn_points = {}
+        for _ in range(spawn_count):
+            name, offset = self.read_string(offset)
+            self.spawn_points[name] = SPAWN.unpack_from(self.buffer, offset)
+            offset += SPAWN.size
+
+    def close(self):
+        #Release the views into the file before unmapping it
+        for layer in self.layers.values():
+            if isinstance(layer, memoryview):
+                layer.release()
+        self.view.release()
+        self.buffer.close()
+
+    def read_string(self, offset):
+        length, = STRING.unpack_from(self.buffer, offset)
+        offset += STRING.size
+        return bytes(self.view[offset:offset + length]).decode('utf-8'), offset + length
+
+    def sources(self):
+        #Files the level was compiled from, used to tell if the compiled file is out of date
+        return [tileset[7] for tileset in self.tilesets]
+
+    def layer(self, name):
+        return self.layers[name]
+
+    def tile_positions(self, name):
+        #(x, y) of every non-empty tile of a layer
+        width = self.width
+        for index, gid in enumerate(self.layers[name]):
+            if gid:
+                yield index % width, index // width
+
+    def objects(self, name):
+        return self.object_groups[name]
+
+    def get_tile_image(self, gid, scale = 1):
+        #Every (gid, scale) is sliced or scaled once, all tiles using it share the same surface
+        surf = self.tile_images.get((gid, scale))
+        if surf is None:
+            if scale != 1:
+                surf = self.get_tile_image(gid)
+                surf = pygame.transform.scale(surf, (surf.get_width() * scale, surf.get_height() * scale))
+            else:
+                surf = self.slice_tile(gid)
+            self.tile_images[(gid, scale)] = surf
+        return surf
+
+    def slice_tile(self, gid):
+        for firstgid, tilecount, columns, tile_width, tile_height, margin, spacing, _, image in self.tilesets:
+            if firstgid <= gid < firstgid + tilecount:
+                local_id = gid - firstgid
+                x = margin + (local_id % columns) * (tile_width + spacing)
+                y = margin + (local_id // columns) * (tile_height + spacing)
+                return import_image(image).subsurface((x, y, tile_width, tile_height))
+        raise KeyError(f'gid {gid} is not in any tileset of {self.path}')
+
+def compile_level(tmx_path, out_path):
+    #Parse the .tmx and its .tsx tilesets once and write everything the game needs into a binary file
+    import xml.etree.ElementTree as ElementTree  #Only needed when the level has to be compiled
+
+    root = ElementTree.parse(tmx_path).getroot()
+    if root.get('infinite') == '1':
+        raise ValueError(f'{tmx_path}: infinite maps are not supported')
+    width, height = int(root.get('width')), int(root.get('height'))
+    map_dir = os.path.dirname(tmx_path)
+
+    tilesets = []
+    for node in root.findall('tileset'):
+        firstgid = int(node.get('firstgid'))
+        source = ''
+        if node.get('source'):
+            source = os.path.normpath(os.path.join(map_dir, node.get('source')))
+            node = ElementTree.parse(source).getroot()
+        image = node.find('image')
+        image_path = os.path.normpath(os.path.join(os.path.dirname(source) if source else map_dir, image.get('source')))
+        tilesets.append((firstgid, int(node.get('tilecount')), int(node.get('columns')),
+                         int(node.get('tilewidth')), int(node.get('tileheight')),
+                         int(node.get('margin', 0)), int(node.get('spacing', 0)), source, image_path))
+
+    layers = []
+    for node in root.findall('layer'):
+        layers.append((node.get('name'), read_layer_data(node.find('data'), width * height, tmx_path)))
+
+    object_groups = []
+    spawn_points = []
+    for node in root.findall('objectgroup'):
+        objects = []
+        for obj in node.findall('object'):
+            gid = int(obj.get('gid', 0)) & GID_MASK
+            x, y = float(obj.get('x', 0)), float(obj.get('y', 0))
+            obj_width, obj_height = float(obj.get('width', 0)), float(obj.get('height', 0))
+            if gid:
+                y -= obj_height  #Tile objects are anchored at their bottom left in Tiled
+            name = obj.get('name', '')
+            objects.append((int(obj.get('id', 0)), gid, x, y, obj_width, obj_height, name))
+            if not gid and not obj_width and not obj_height and name:
+                spawn_points.append((name, x, y))  #Named point objects are spawn points
+        object_groups.append((node.get('name'), objects))
+
+    #Header and tables first, then the layer arrays at 4-byte aligned offsets
+    table = bytearray(HEADER.pack(LEVEL_MAGIC, LEVEL_FORMAT_VERSION, width, height,
+                                  int(root.get('tilewidth')), int(root.get('tileheight')),
+                                  len(tilesets), len(layers), len(object_groups), len(spawn_points)))
+    for *numbers, source, image_path in tilesets:
+        table += TILESET.pack(*numbers) + pack_string(source) + pack_string(image_path)
+
+    layer_offsets = []
+    for name, _ in layers:
+        table += pack_string(name)
+        layer_offsets.append(len(table))
+        table += LAYER.pack(0)  #Filled in once the table size is known
+    for name, objects in object_groups:
+        table += pack_string(name) + OBJECT_GROUP.pack(len(objects))
+        for *numbers, obj_name in objects:
+            table += OBJECT.pack(*numbers) + pack_string(obj_name)
+    for name, x, y in spawn_points:
+        table += pack_string(name) + SPAWN.pack(x, y)
+
+    table += bytes(-len(table) % 4)
+    data_offset = len(table)
+    for (_, gids), table_offset in zip(layers, layer_offsets):
+        LAYER.pack_into(table, table_offset, data_offset)
+        data_offset += len(gids) * 4
+
+    #Write to a temporary file first so a crash never leaves a half written level behind
+    temp_path = out_path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(table)
+        for _, gids in layers:
+            if sys.byteorder != 'little':
+                gids.byteswap()
+            file.write(gids.tobytes())
+    os.replace(temp_path, out_path)
+
+def read_layer_data(node, tile_count, tmx_path):
+    encoding, compression = node.get('encoding'), node.get('compression')
+    if encoding == 'csv':
+        gids = array('I', (int(value) & GID_MASK for value in node.text.replace('\n', '').split(',') if value.strip()))
+    elif encoding == 'base64':
+        import base64, zlib
+        raw = base64.b64decode(node.text.strip())
+        if compression in ('zlib', 'gzip'):
+            raw = zlib.decompress(raw, 47)  #47 detects zlib and gzip headers
+        elif compression:
+            raise ValueError(f'{tmx_path}: {compression} compressed layers are not supported')
+        gids = array('I', raw)
+        if sys.byteorder != 'little':
+            gids.byteswap()
+        gids = array('I', (gid & GID_MASK for gid in gids))
+    else:
+        raise ValueError(f'{tmx_path}: layers must be saved as csv or base64')
+    if len(gids) != tile_count:
+        raise ValueError(f'{tmx_path}: layer has {len(gids)} tiles, expected {tile_count}')
+    return gids
+
+def pack_string(text):
+    data = text.encode('utf-8')
+    return STRING.pack(len(data)) + data
+
+def is_stale(level, tmx_path, compiled_path):
+    #The compiled file is out of date when the map or one of its tilesets was saved after it.
+    #Missing sources are ignored so a compiled level can be shipped on its own.
+    compiled_time = os.path.getmtime(compiled_path)
+    for source in [tmx_path] + [source for source in level.sources() if source]:
+        if os.path.exists(source) and os.path.getmtime(source) > compiled_time:
+            return True
+    return False
+
+def load_level(tmx_path = MAP_FILE, compiled_path = None):
+    #Load the compiled level, compiling it first when it is missing, outdated or from an older format
+    compiled_path = compiled_path or os.path.splitext(tmx_path)[0] + LEVEL_FILE_EXTENSION
+    if os.path.exists(compiled_path):
+        try:
+            level = LevelData(compiled_path)
+        except (ValueError, struct.error):
+            level = None
+        if level and not is_stale(level, tmx_path, compiled_path):
+            return level
+        if level:
+            level.close()
+    compile_level(tmx_path, compiled_path)
+    return LevelData(compiled_path)
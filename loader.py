@@ -0,0 +1,65 @@
+import os
+import pygame
+from settings import *
+from support import asset_cache
+
+#Image folders and files the level needs before it can show its first frame
+STARTUP_FOLDERS = ['graphics/soil', 'graphics/soil_water', 'graphics/water', 'graphics/fruit/corn', 'graphics/overlay']
+STARTUP_FILES = ['NEW_MAP.png']
+
+def startup_assets(level_data):
+    #Every image path Level() loads while it is built
+    folders = ['graphics/character/' + name for name in sorted(os.listdir('graphics/character'))
+               if os.path.isdir('graphics/character/' + name)]
+    folders += STARTUP_FOLDERS
+
+    paths = []
+    for folder in folders:
+        paths += [folder + '/' + name for name in asset_cache.list_folder(folder)]
+    paths += STARTUP_FILES
+    paths += [tileset[8] for tileset in level_data.tilesets]  #Tileset images
+    return [path for path in dict.fromkeys(paths) if path not in asset_cache.images]
+
+def decode_image(path):
+    #Runs on a worker thread: read and decode the file into raw RGBA bytes
+    surf = pygame.image.load(path)
+    return path, pygame.image.tobytes(surf, 'RGBA'), surf.get_size()
+
+class LoadingScreen:
+    #Progress bar shown while the game assets are loading
+    def __init__(self):
+        self.display_surface = pygame.display.get_surface()  #Get the current display surface
+        self.bar_rect = pygame.Rect(0, 0, SCREEN_WIDTH // 2, 24)  #Outline of the progress bar
+        self.bar_rect.center = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+
+    def draw(self, done, total):
+        pygame.event.pump()  #Keep the window responsive while loading
+
+        self.display_surface.fill('black')
+        fill_rect = self.bar_rect.copy()
+        fill_rect.width = self.bar_rect.width * done // max(total, 1)  #Part of the bar for the loaded assets
+        pygame.draw.rect(self.display_surface, 'White', fill_rect, 0, 4)
+        pygame.draw.rect(self.display_surface, 'White', self.bar_rect, 2, 4)
+        pygame.display.update()
+
+class AssetLoader:
+    #Decodes image files on a thread pool and turns them into display Surfaces on the main thread.
+    #The surfaces go into the shared asset cache, so the later import_folder/import_image calls find them there.
+    def __init__(self, paths, workers = LOADER_WORKERS):
+        self.paths = paths
+        self.workers = workers
+        self.loaded = 0  #Number of images ready in the cache
+
+    def run(self, on_progress = None):
+        from concurrent.futures import ThreadPoolExecutor, as_completed  #Only needed while loading
+
+        with ThreadPoolExecutor(max_workers = self.workers) as executor:
+            futures = [executor.submit(decode_image, path) for path in self.paths]
+            for future in as_completed(futures):
+                path, data, size = future.result()
+                #Converting needs the display, so it has to happen on the main thread
+                surf = pygame.image.frombytes(data, size, 'RGBA').convert_alpha()
+                asset_cache.store(path, surf)
+                self.loaded += 1
+                if on_progress:
+                    on_progress(self.loaded, len(self.paths))
@@ -1,25 +1,72 @@
-import pygame, sys
+import pygame, sys, random
 from settings import *
-from spritelayer import Level        
+from level_data import load_level
+from loader import AssetLoader, LoadingScreen, startup_assets
+from pacing import FramePacer
 
 class Game:                    
     def __init__(self):   
         pygame.init() #Initialize Pygame Modules
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT)) #Game Window Dimensions Set Up 
         pygame.display.set_caption('Sunny Sprouts') #Title on Window
-        self.clock = pygame.time.Clock() #Initializes CLock to control the Game's Frame Rate
-        self.level = Level() #Calls Level class, Assigning it to self.level 
+        self.loading_screen = LoadingScreen() #Progress bar shown until the first frame
+        self.loading_screen.draw(0, 1)
+
+        #Load the map, then decode the images it needs on worker threads while showing the progress
+        level_data = load_level(MAP_FILE)
+        AssetLoader(startup_assets(level_data)).run(self.loading_screen.draw)
+
+        from spritelayer import Level #Game modules are imported once the window is already showing
+        from savegame import AutoSaver, load_save, encode_snapshot
+        from timer import Timer
+        save = load_save(SAVE_FILE, (level_data.width, level_data.height))
+        seed = random.randrange(1 << 32) #Known seed for the level's drops, so a recorded session can be replayed
+        self.level = Level(level_data, seed, save) #Calls Level class, continuing the saved game if there is one
+        if PROFILER_EXPORT_FILE:
+            self.level.profiler.start_export(PROFILER_EXPORT_FILE) #Stream frame timings from the first frame
+
+        #Record the session for replay.py when RECORD_FILE is set
+        self.recorder = None
+        if RECORD_FILE:
+            from replay import InputRecorder
+            self.recorder = InputRecorder(RECORD_FILE, seed, encode_snapshot(save) if save else b'')
+            self.level.controls.recorder = self.recorder.on_input
+
+        #Saves are written on a background thread, every AUTOSAVE_INTERVAL seconds of game time
+        self.saver = AutoSaver(SAVE_FILE)
+        self.autosave_timer = Timer(self.level.clock, AUTOSAVE_INTERVAL * 1000, self.autosave)
+        self.autosave_timer.activate()
+        self.pacer = FramePacer() #Controls the Game's Frame Rate and simulation steps, the first frame starts now
                         
+    def autosave(self):
+        #Copy the state now, it is encoded and written while the game goes on
+        self.saver.save(self.level.snapshot())
+        self.autosave_timer.activate()
+
     def run(self): 
         while True: #Main Game Loop
             for event in pygame.event.get(): #Checks for user input
                 if event.type == pygame.QUIT: #Checks if quitting is detected
+                    self.level.profiler.close() #Write the frame timings not exported yet
+                    self.saver.save(self.level.snapshot()) #Save the game as it is left
+                    error = self.saver.close() #Wait for the save to be written
+                    if error:
+                        print(f'The game was not saved: {error}', file = sys.stderr)
+                    if self.recorder:
+                        self.recorder.close() #Write the recorded session
                     pygame.quit() #All Modules Uninitializes
                     sys.exit() #If detected, Game ends, Program exits
+                if event.type == pygame.KEYDOWN and event.key == KEY_BINDINGS['profiler']:
+                    self.level.profiler.toggle() #Show or hide the frame profiler
+                self.pacer.handle_event(event) #Window focus changes
+                self.level.controls.handle_event(event) #Key presses become actions for the next update
 
-            #Delta time (dt): The time that passes in between two consecutive frames.
-            dt = self.clock.tick() / 1000 #Time is converted to Seconds from Milliseconds
-            self.level.run(dt) #Update and Renders Level, passing delta time (dt)
+            #Wait for the next frame, slower while a menu is open or the window is in the background.
+            #Delta time (dt) is the fixed simulation step, run as many times as the elapsed time covers.
+            dt, steps = self.pacer.tick(self.level.menu_open())
+            self.level.run(dt, steps, self.pacer.alpha) #Update and Renders Level
+            if self.recorder:
+                self.recorder.end_frame(dt, steps, self.pacer.alpha)
             pygame.display.update() #Refreshes and shows updated frames
 
 #Runs the Game
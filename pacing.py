@@ -0,0 +1,45 @@
+import pygame
+from settings import *
+
+#FramePacer decides how long a frame waits and how many simulation steps it runs.
+#With a fixed timestep the game always updates in SIMULATION_DT steps, the time left over
+#is carried to the next frame and the drawing is interpolated between the last two steps.
+class FramePacer:
+    def __init__(self, fps = FPS, uncapped = UNCAPPED_FPS, fixed_timestep = FIXED_TIMESTEP, step = SIMULATION_DT):
+        self.clock = pygame.time.Clock()
+        self.fps = fps #Target frame rate, ignored when uncapped
+        self.uncapped = uncapped #Draw as fast as possible
+        self.fixed_timestep = fixed_timestep
+        self.step = step #Length of one simulation step in seconds
+
+        self.accumulator = 0 #Frame time not simulated yet, always less than one step
+        self.alpha = 1 #How far the drawing is between the previous and the current step (0 to 1)
+        self.focused = True #Window has input focus, unfocused windows are throttled
+
+    def handle_event(self, event):
+        #Follow the window focus from the event queue
+        if event.type in (pygame.WINDOWFOCUSLOST, pygame.WINDOWMINIMIZED):
+            self.focused = False
+        elif event.type in (pygame.WINDOWFOCUSGAINED, pygame.WINDOWRESTORED):
+            self.focused = True
+
+    def frame_rate(self, menu_open = False):
+        #Frame rate cap for this frame, 0 means no cap
+        if not self.focused:
+            return BACKGROUND_FPS
+        if menu_open:
+            return MENU_FPS
+        return 0 if self.uncapped else self.fps
+
+    def tick(self, menu_open = False):
+        #Wait for the next frame, then return (dt, steps): update the game steps times with dt
+        frame_time = min(self.clock.tick(self.frame_rate(menu_open)) / 1000, MAX_FRAME_TIME)
+        if not self.fixed_timestep:
+            self.alpha = 1
+            return frame_time, 1
+
+        self.accumulator += frame_time
+        steps = int(self.accumulator // self.step)
+        self.accumulator -= steps * self.step
+        self.alpha = self.accumulator / self.step
+        return self.step, steps
@@ -0,0 +1,53 @@
+import pygame
+from collections import deque
+from weakref import WeakKeyDictionary
+from settings import *
+
+#ParticleSystem draws the short white flash left where a log, rock, grass or harvested plant disappears.
+#Particles are plain records drawn by the system itself instead of sprites in all_sprites,
+#finished records are reused and every source image is turned into a silhouette only once.
+class ParticleSystem:
+    def __init__(self, clock, duration = PARTICLE_DURATION):
+        self.clock = clock #GameClock of the level, flashes last for its time
+        self.duration = duration #How long a flash lasts in milliseconds of game time
+        self.z = LAYERS['Death'] #Layer for the order of rendering
+
+        self.silhouettes = WeakKeyDictionary() #Source surface -> white silhouette, dropped with the source
+        self.active = deque() #[silhouette, rect, end time] of the shown particles, oldest first
+        self.pool = [] #Finished records, reused by the next emit
+
+    def silhouette(self, surf):
+        silhouette = self.silhouettes.get(surf)
+        if silhouette is None:
+            #Masks sprite image, allows transparency
+            silhouette = pygame.mask.from_surface(surf).to_surface()
+            silhouette.set_colorkey((0, 0, 0)) #Remove black pixels
+            self.silhouettes[surf] = silhouette
+        return silhouette
+
+    def emit(self, pos, surf):
+        #Flash the silhouette of surf with its top left corner at pos
+        silhouette = self.silhouette(surf)
+        record = self.pool.pop() if self.pool else [None, pygame.Rect(0, 0, 0, 0), 0]
+        record[0] = silhouette
+        record[1].update(pos, silhouette.get_size())
+        record[2] = self.clock.ticks + self.duration
+        self.active.append(record)
+
+    def update(self, dt):
+        #Every particle lasts as long, so the ones that are over are always at the front
+        now = self.clock.ticks
+        active = self.active
+        while active and active[0][2] <= now:
+            record = active.popleft()
+            record[0] = None #Let go of the silhouette
+            self.pool.append(record)
+
+    def draw_layer(self, surface, layer, view_rect):
+        if layer != self.z or not self.active:
+            return
+        surface.blits([(silhouette, rect.move(-view_rect.x, -view_rect.y))
+                       for silhouette, rect, _ in self.active if rect.colliderect(view_rect)], False)
+
+    def __len__(self):
+        return len(self.active)
@@ -10,7 +10,7 @@ from inventory import *
 class Player(pygame.sprite.Sprite):
     # The constructor sets up the player's initial properties like position, sprite group,
     # collision groups, tools, inventory, and other important attributes.
-    def __init__(self, pos, group, collision_sprites, log_sprites, rock_sprites, grass_sprites, interaction_sprites, soil_layer, toggle_shop, toggle_instructions) -> None:
+    def __init__(self, pos, group, collision_sprites, collision_grid, log_sprites, rock_sprites, grass_sprites, interaction_sprites, soil_layer, toggle_shop, toggle_instructions, controls, clock) -> None:
         super().__init__(group)
 
         self.import_assets()  # Load the character sprites.
@@ -29,13 +29,12 @@ class Player(pygame.sprite.Sprite):
         # Initialize the hitbox for more accurate collision detection.
         self.hitbox = self.rect.copy().inflate((-126, -70))  # Shrinks the rect for collisions.
         self.collision_sprites = collision_sprites  # Stores the other sprites for collision detection.
+        self.collision_grid = collision_grid  # Blocked map tiles, checked by tile position.
 
-        # Initialize timers for tool use and seed switching.
+        # Initialize timers for tool and seed use.
         self.timers = {
-            'tool use': Timer(350, self.use_tool),  # Timer for using tools with a 350ms cooldown.
-            'tool switch': Timer(200),  # Timer for switching tools with a 200ms cooldown.
-            'seed use': Timer(350, self.use_seed),  # Timer for using seeds with a 350ms cooldown.
-            'seed switch': Timer(200),  # Timer for switching seeds with a 200ms cooldown.
+            'tool use': Timer(clock, 350, self.use_tool),  # Timer for using tools with a 350ms cooldown.
+            'seed use': Timer(clock, 350, self.use_seed),  # Timer for using seeds with a 350ms cooldown.
         }
 
         # Initialize inventory, including tools and seeds.
@@ -73,6 +72,10 @@ class Player(pygame.sprite.Sprite):
         self.toggle_shop = toggle_shop
         self.toggle_instructions = toggle_instructions
 
+        # Actions from the keyboard or injected input, discrete ones arrive through on_action.
+        self.controls = controls
+        controls.subscribe('game', self.on_action)
+
     # Load animations for each possible player action.
     def import_assets(self):
         self.animations = {'up':[], 'down':[], 'left':[], 'right':[],
@@ -93,17 +96,17 @@ class Player(pygame.sprite.Sprite):
 
         if self.selected_tool == 'axe':
             if self.target_pos is not None:
-                # Check for collisions and damage with logs, rocks, and grass.
-                for log in self.log_sprites.sprites():
-                    if isinstance(log, Log_Class) and log.rect.collidepoint(self.target_pos):
+                # Look up the logs, rocks and grass under the target position and damage them.
+                for log in self.log_sprites.at_point(self.target_pos):
+                    if isinstance(log, Log_Class):
                         log.damage()
 
-                for rock in self.rock_sprites.sprites():
-                    if isinstance(rock, Rock_Class) and rock.rect.collidepoint(self.target_pos):
+                for rock in self.rock_sprites.at_point(self.target_pos):
+                    if isinstance(rock, Rock_Class):
                         rock.damage()
 
-                for grass in self.grass_sprites.sprites():
-                    if isinstance(grass, Grass_Class) and grass.rect.collidepoint(self.target_pos):
+                for grass in self.grass_sprites.at_point(self.target_pos):
+                    if isinstance(grass, Grass_Class):
                         grass.damage()
 
         if self.selected_tool == 'water':
@@ -126,60 +129,80 @@ class Player(pygame.sprite.Sprite):
             self.frame_index = 0  # Reset the frame index if it exceeds the animation length.
         self.image = self.animations[self.status][int(self.frame_index)]  # Update the player's image.
 
-    # Handle player input for movement, tool usage, menu access, etc.
+    # Handle the held actions for movement and tool usage.
     def input(self):
-        keys = pygame.key.get_pressed()  # Get currently pressed keys.
+        controls = self.controls
 
         if not self.timers["tool use"].active:  # Check if tool usage is on cooldown.
-            if keys[pygame.K_w]:  # Moving up
+            if controls.is_held('up'):  # Moving up
                 self.direction.y = -1
                 self.status = 'up'
-            elif keys[pygame.K_s]:  # Moving down
+            elif controls.is_held('down'):  # Moving down
                 self.direction.y = 1
                 self.status = 'down'
             else:
                 self.direction.y = 0
 
-            if keys[pygame.K_a]:  # Moving left
+            if controls.is_held('left'):  # Moving left
                 self.direction.x = -1
                 self.status = 'left'
-            elif keys[pygame.K_d]:  # Moving right
+            elif controls.is_held('right'):  # Moving right
                 self.direction.x = 1
                 self.status = 'right'
             else:
                 self.direction.x = 0
 
-            # Tool usage
-            if keys[pygame.K_SPACE]:
-                self.timers['tool use'].activate()  # Use the currently selected tool.
-                self.direction = pygame.math.Vector2()
-                self.frame_index = 0  # Reset frame index when tool is used.
-
-            # Change tool
-            if keys[pygame.K_q] and not self.timers['tool switch'].active:
-                self.timers['tool switch'].activate()
-                self.tool_index += 1
-                self.tool_index = self.tool_index if self.tool_index < len(self.tools) else 0
-                self.selected_tool = self.tools[self.tool_index]
+            # Tool usage, repeats after the cooldown while held
+            if controls.is_held('tool'):
+                self.start_tool()
 
             # Seed usage
-            if keys[pygame.K_LCTRL]:
-                self.timers['seed use'].activate()
-                self.direction = pygame.math.Vector2()
-                self.frame_index = 0
-
-            # Open shop menu
-            if keys[pygame.K_m]:
+            if controls.is_held('seed'):
+                self.start_seed()
+
+    # Handle a pressed action: tool and seed start right away, the others happen once per press.
+    def on_action(self, action, kind):
+        if kind != 'press':
+            return
+
+        if action == 'tool':
+            self.start_tool()
+        elif action == 'seed':
+            self.start_seed()
+
+        if self.timers["tool use"].active:  # Nothing else while a tool is being used.
+            return
+
+        # Change tool
+        if action == 'switch tool':
+            self.tool_index += 1
+            self.tool_index = self.tool_index if self.tool_index < len(self.tools) else 0
+            self.selected_tool = self.tools[self.tool_index]
+
+        # Open shop menu
+        if action == 'shop':
+            self.toggle_shop()
+            collided_interaction_sprite = pygame.sprite.spritecollide(self, self.interaction_sprites, False)
+            if collided_interaction_sprite:
                 self.toggle_shop()
-                collided_interaction_sprite = pygame.sprite.spritecollide(self, self.interaction_sprites, False)
-                if collided_interaction_sprite:
-                    self.toggle_shop()
-                else:
-                    self.status = 'left_idle'
+            else:
+                self.status = 'left_idle'
 
-            # Open instructions menu
-            if keys[pygame.K_i]:
-                self.toggle_instructions()
+        # Open instructions menu
+        if action == 'instructions':
+            self.toggle_instructions()
+
+    def start_tool(self):
+        if not self.timers['tool use'].active:
+            self.timers['tool use'].activate()  # Use the currently selected tool.
+            self.direction = pygame.math.Vector2()
+            self.frame_index = 0  # Reset frame index when tool is used.
+
+    def start_seed(self):
+        if not self.timers['tool use'].active and not self.timers['seed use'].active:
+            self.timers['seed use'].activate()
+            self.direction = pygame.math.Vector2()
+            self.frame_index = 0
 
     # Update the player's status based on their movement.
     def get_status(self):
@@ -189,33 +212,31 @@ class Player(pygame.sprite.Sprite):
         if self.timers["tool use"].active:
             self.status = self.status.split("_")[0] + "_" + self.selected_tool  # Update status during tool use.
 
-    # Update the timers for tool and seed actions.
-    def update_timers(self):
-        for timer in self.timers.values():
-            timer.update()
-
     # Handle collisions for the player, preventing them from passing through objects.
     def collide(self, direction):
-        for sprite in self.collision_sprites.sprites():
-            if hasattr(sprite, 'hitbox'):
-                if sprite.hitbox.colliderect(self.hitbox):
-                    if direction == 'horizontal':
-                        # Handle horizontal collision.
-                        if self.direction.x > 0:
-                            self.hitbox.right = sprite.hitbox.left
-                        if self.direction.x < 0:
-                            self.hitbox.left = sprite.hitbox.right
-                        self.rect.centerx = self.hitbox.centerx
-                        self.pos.x = self.hitbox.centerx
-
-                    if direction == 'vertical':
-                        # Handle vertical collision.
-                        if self.direction.y > 0:
-                            self.hitbox.bottom = sprite.hitbox.top
-                        if self.direction.y < 0:
-                            self.hitbox.top = sprite.hitbox.bottom
-                        self.rect.centery = self.hitbox.centery
-                        self.pos.y = self.hitbox.centery
+        # Only the sprites sharing a grid cell with the hitbox are tested, then the blocked tiles under it.
+        hitboxes = [sprite.hitbox for sprite in self.collision_sprites.query(self.hitbox)]
+        hitboxes += self.collision_grid.query(self.hitbox)
+
+        for hitbox in hitboxes:
+            if hitbox.colliderect(self.hitbox):
+                if direction == 'horizontal':
+                    # Handle horizontal collision.
+                    if self.direction.x > 0:
+                        self.hitbox.right = hitbox.left
+                    if self.direction.x < 0:
+                        self.hitbox.left = hitbox.right
+                    self.rect.centerx = self.hitbox.centerx
+                    self.pos.x = self.hitbox.centerx
+
+                if direction == 'vertical':
+                    # Handle vertical collision.
+                    if self.direction.y > 0:
+                        self.hitbox.bottom = hitbox.top
+                    if self.direction.y < 0:
+                        self.hitbox.top = hitbox.bottom
+                    self.rect.centery = self.hitbox.centery
+                    self.pos.y = self.hitbox.centery
 
     # Move the player based on input and apply collision handling.
     def move(self, dt):
@@ -238,6 +259,5 @@ class Player(pygame.sprite.Sprite):
         self.input()  # Handle input.
         self.move(dt)  # Update position based on input.
         self.get_status()  # Update status.
-        self.update_timers()  # Update timers for actions.
         self.get_target_pos()  # Update target position for tools and planting.
         self.animate(dt)  # Animate player based on current status.
@@ -0,0 +1,142 @@
+import csv
+import json
+import pygame
+from collections import deque
+from time import perf_counter_ns
+from settings import *
+
+#Phases of a frame, in the order Level runs them
+PROFILER_PHASES = ('input', 'timers', 'sprites', 'streaming', 'crops', 'plant_collision', 'menu', 'custom_draw', 'overlay')
+
+#FrameProfiler times the phases of every frame and keeps the last frames in a ring buffer.
+#While it is off, measure() only calls the function, so the game pays one check per phase.
+class FrameProfiler:
+    def __init__(self, sprite_counts, history = PROFILER_HISTORY):
+        self.sprite_counts = sprite_counts #Returns name -> sprite count, only called while profiling
+        self.enabled = False #Frames are timed while the overlay is shown or an export is running
+        self.visible = False #On-screen overlay
+
+        self.frames = deque(maxlen = history) #Records of the last frames, oldest first
+        self.phase_times = {} #Phase -> nanoseconds spent in it this frame
+        self.frame_number = 0
+        self.last_frame_end = None #perf_counter_ns() at the end of the previous frame
+
+        self.export = None #FrameExport streaming the records to a file
+        self.font = None #Loaded the first time the overlay is shown
+        self.overlay_surf = None #Overlay text, redrawn every PROFILER_OVERLAY_REFRESH frames
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.update_enabled()
+
+    def start_export(self, path):
+        self.stop_export()
+        self.export = FrameExport(path, self.columns(), self.frame_number)
+        self.update_enabled()
+
+    def stop_export(self):
+        if self.export:
+            self.export.write(self.frames)
+            self.export.close()
+            self.export = None
+        self.update_enabled()
+
+    def update_enabled(self):
+        enabled = self.visible or self.export is not None
+        if enabled and not self.enabled:
+            self.last_frame_end = None #The time spent while off does not count as a frame
+        self.enabled = enabled
+
+    def columns(self):
+        return ['frame', 'frame_ms'] + [phase + '_ms' for phase in PROFILER_PHASES] + list(self.sprite_counts())
+
+    def measure(self, phase, func, *args):
+        #Call func(*args), timing it as part of phase while profiling
+        if not self.enabled:
+            return func(*args)
+        start = perf_counter_ns()
+        result = func(*args)
+        self.phase_times[phase] = self.phase_times.get(phase, 0) + perf_counter_ns() - start
+        return result
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = perf_counter_ns()
+        self.frame_number += 1
+
+        #Frame time is measured from the end of the previous frame, so it includes the display flip and the wait
+        record = {'frame': self.frame_number,
+                  'frame_ms': (now - self.last_frame_end) / 1e6 if self.last_frame_end else 0.0}
+        for phase in PROFILER_PHASES:
+            record[phase + '_ms'] = self.phase_times.get(phase, 0) / 1e6
+        record.update(self.sprite_counts())
+        self.frames.append(record)
+        self.phase_times.clear()
+
+        if self.export and self.frame_number % PROFILER_FLUSH_FRAMES == 0:
+            self.export.write(self.frames)
+        if self.visible and (self.overlay_surf is None or self.frame_number % PROFILER_OVERLAY_REFRESH == 0):
+            self.overlay_surf = self.render_overlay()
+        self.last_frame_end = perf_counter_ns() #Time spent profiling is left out of the next frame
+
+    def percentiles(self, column):
+        #Rolling p50 and p99 of a column over the frames in the ring buffer
+        values = sorted(record[column] for record in self.frames)
+        if not values:
+            return 0, 0
+        return values[len(values) // 2], values[min(len(values) - 1, int(len(values) * 0.99))]
+
+    def render_overlay(self):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 22)
+        rows = [('', 'p50 ms', 'p99 ms')]
+        for column in ['frame_ms'] + [phase + '_ms' for phase in PROFILER_PHASES]:
+            p50, p99 = self.percentiles(column)
+            rows.append((column[:-3], f'{p50:.2f}', f'{p99:.2f}'))
+        rows += [(name, str(count), '') for name, count in self.sprite_counts().items() if count]
+
+        #Names left aligned, numbers right aligned in their columns
+        cells = [[self.font.render(text, True, 'White') for text in row] for row in rows]
+        widths = [max(row[index].get_width() for row in cells) + 12 for index in range(3)]
+        line_height = self.font.get_linesize()
+        surf = pygame.Surface((sum(widths) + 12, line_height * len(cells) + 10), pygame.SRCALPHA)
+        surf.fill((0, 0, 0, 170))
+        for row_index, row in enumerate(cells):
+            y = 5 + row_index * line_height
+            surf.blit(row[0], (8, y))
+            surf.blit(row[1], (8 + widths[0] + widths[1] - row[1].get_width(), y))
+            surf.blit(row[2], (8 + sum(widths) - row[2].get_width(), y))
+        return surf
+
+    def draw(self, surface):
+        if self.visible and self.overlay_surf:
+            surface.blit(self.overlay_surf, (10, 10))
+
+    def close(self):
+        self.stop_export()
+
+class FrameExport:
+    #Appends frame records to a .csv or .jsonl file, only records newer than the last write are added
+    def __init__(self, path, columns, first_frame):
+        self.path = path
+        self.jsonl = path.endswith('.jsonl')
+        self.file = open(path, 'w', newline = '')
+        self.writer = None if self.jsonl else csv.DictWriter(self.file, columns)
+        if self.writer:
+            self.writer.writeheader()
+        self.last_frame = first_frame #Number of the last frame written, earlier frames are not exported
+
+    def write(self, frames):
+        #Frames that dropped out of the ring buffer before a write are lost, the frame column shows the gap
+        for record in frames:
+            if record['frame'] > self.last_frame:
+                if self.jsonl:
+                    self.file.write(json.dumps(record) + '\n')
+                else:
+                    self.writer.writerow(record)
+                self.last_frame = record['frame']
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,113 @@
+import os
+import zlib
+import struct
+from time import perf_counter_ns
+from settings import *
+
+#Recordings start with this header, one of another version can't be replayed
+REPLAY_MAGIC = b'SSRP'
+REPLAY_FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<4sHQI')  #magic, version, level seed, byte length of the save the session started from
+FRAME = struct.Struct('<dBdH')  #dt, steps, alpha, number of inputs that follow, one byte each
+ACTIONS = tuple(KEY_BINDINGS)  #An input byte is the action's index here shifted left once, plus 1 for a press
+
+#InputRecorder writes down everything a session depends on: the level seed, the save it continued from,
+#every action pressed or released and the dt and steps of every frame. The frames are kept in memory
+#and compressed on close, most of them are identical and have no input.
+class InputRecorder:
+    def __init__(self, path, seed, save = b''):
+        self.path = path
+        self.seed = seed
+        self.save = save  #Encoded save the level was restored from, empty for a new game
+        self.frames = bytearray()
+        self.inputs = bytearray()  #Inputs since the last frame, applied before it ran
+
+    def on_input(self, action, pressed):
+        #Called by the InputManager for every press and release that changed what is held
+        self.inputs.append(ACTIONS.index(action) << 1 | pressed)
+
+    def end_frame(self, dt, steps, alpha):
+        self.frames += FRAME.pack(dt, steps, alpha, len(self.inputs))
+        self.frames += self.inputs
+        self.inputs.clear()
+
+    def close(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(HEADER.pack(REPLAY_MAGIC, REPLAY_FORMAT_VERSION, self.seed, len(self.save)))
+            file.write(self.save)
+            file.write(zlib.compress(bytes(self.frames)))
+        os.replace(temp_path, self.path)
+
+class Recording:
+    #A recording read back, frames are (dt, steps, alpha, [(action, pressed)])
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+        magic, version, self.seed, save_length = HEADER.unpack_from(data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_FORMAT_VERSION:
+            raise ValueError(f'{path} is not a recording of version {REPLAY_FORMAT_VERSION}')
+        offset = HEADER.size
+        self.save = data[offset:offset + save_length]
+        frames = zlib.decompress(data[offset + save_length:])
+
+        self.frames = []
+        offset = 0
+        while offset < len(frames):
+            dt, steps, alpha, count = FRAME.unpack_from(frames, offset)
+            offset += FRAME.size
+            inputs = [(ACTIONS[value >> 1], bool(value & 1)) for value in frames[offset:offset + count]]
+            offset += count
+            self.frames.append((dt, steps, alpha, inputs))
+
+def replay(recording, render = False, level_data = None):
+    #Run a recorded session again and return the level it ends with and the time of every frame in nanoseconds.
+    #The level's game clock starts at 0 like in a new game, so the same recording always gives the same game state.
+    from simulation import init_display
+    init_display()
+    from spritelayer import Level #Needs the display to be set up first
+    from savegame import decode_snapshot
+
+    level = Level(level_data, recording.seed, save = decode_snapshot(recording.save) if recording.save else None)
+    controls = level.controls
+    times = []
+    for dt, steps, alpha, inputs in recording.frames:
+        for action, pressed in inputs:
+            if pressed:
+                controls.press(action)
+            else:
+                controls.release(action)
+        start = perf_counter_ns()
+        level.run(dt, steps, alpha, render)
+        times.append(perf_counter_ns() - start)
+    return level, times
+
+#Replays a recording from the command line: python replay.py session.rpl [--render] [--output frames.csv]
+if __name__ == '__main__':
+    import argparse
+    from benchmarks.harness import summarize
+    from savegame import encode_snapshot
+
+    parser = argparse.ArgumentParser(description = 'Replay a recorded session and time every frame.')
+    parser.add_argument('recording', help = 'file written with RECORD_FILE set')
+    parser.add_argument('--render', action = 'store_true', help = 'draw every frame like the game does')
+    parser.add_argument('--output', help = 'write the time of every frame to this .csv file')
+    args = parser.parse_args()
+
+    recording = Recording(args.recording)
+    level, times = replay(recording, args.render)
+
+    stats = summarize(times)
+    print(f'{len(times)} frames, {sum(steps for _, steps, _, _ in recording.frames)} steps')
+    print('frame us   ' + '  '.join(f'{name} {stats[name + "_us"]:.1f}' for name in ('p50', 'p90', 'p99', 'max')))
+    slowest = sorted(range(len(times)), key = times.__getitem__, reverse = True)[:5]
+    print('slowest frames ' + ', '.join(f'{frame} ({times[frame] / 1000:.0f} us)' for frame in slowest))
+    #Same recording, same checksum: a different one means the replay went another way
+    print(f'state checksum {zlib.crc32(encode_snapshot(level.snapshot())):08x}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write('frame,steps,frame_us\n')
+            for frame, ((_, steps, _, _), time) in enumerate(zip(recording.frames, times)):
+                file.write(f'{frame},{steps},{time / 1000:.1f}\n')
@@ -0,0 +1,244 @@
+import os
+import sys
+import zlib
+import struct
+import threading
+from array import array
+from settings import *
+from level_data import STRING, pack_string
+from soil import WATERED
+
+#Save files start with this header, a save of another version is ignored and a new game starts
+SAVE_MAGIC = b'SSSV'
+SAVE_FORMAT_VERSION = 1
+
+#magic, version, player x, player y, tool index, seed index, money, soil grid width and height,
+#number of inventory items, seed kinds, crops, destroyed nodes and damaged nodes
+HEADER = struct.Struct('<4sHddBBiHHHHIII')
+AMOUNT = struct.Struct('<I')  #inventory amount, after the item name
+SIZE = struct.Struct('<I')  #byte length of the block that follows
+CROP = struct.Struct('<HHBd')  #x, y, age, watered time on the current stage, before the seed name
+
+class SaveState:
+    #Everything a save holds, copied out of the level so it can be written from another thread
+    def __init__(self):
+        self.player_pos = (0, 0)
+        self.tool_index = 0
+        self.seed_index = 0
+        self.money = 0
+        self.item_inventory = {}
+        self.seed_inventory = {}
+        self.grid_size = (0, 0)
+        self.grid = b''  #Soil grid flags, one byte per tile
+        self.water = b''  #Water graphic index of every watered tile, in grid order
+        self.crops = []  #(x, y, seed, age, progress) of every planted tile
+        self.destroyed = []  #Ids of destroyed logs, rocks and grass
+        self.damaged = {}  #Id -> health of damaged ones
+
+def take_snapshot(level):
+    #Copy the saved state out of the level, cheap enough to run between two frames
+    player = level.player
+    soil_layer = level.soil_layer
+    grid = soil_layer.grid
+    state = SaveState()
+    state.player_pos = tuple(player.pos)
+    state.tool_index = player.tool_index
+    state.seed_index = player.seed_index
+    state.money = player.money
+    state.item_inventory = dict(player.item_inventory)
+    state.seed_inventory = dict(player.seed_inventory)
+    state.grid_size = (grid.width, grid.height)
+    state.grid = bytes(grid.cells)
+    state.water = bytes(soil_layer.water_surfs.index(soil_layer.water_choices[tile]) if tile in soil_layer.water_choices else 0
+                        for tile in grid.cells_with(WATERED))
+    crops = soil_layer.crops
+    state.crops = [(x, y, seed, crops.age[slot], crops.grown(slot)) for (x, y), (slot, seed) in soil_layer.planted.items()]
+    destroyed, state.damaged = level.streamer.node_state()
+    state.destroyed = sorted(destroyed)
+    return state
+
+def restore_snapshot(level, state):
+    #Put a saved state into a level that was just set up, before its world is streamed in,
+    #so destroyed nodes are never created and soil and plants are created once from the saved grid
+    soil_layer = level.soil_layer
+    grid = soil_layer.grid
+    if state.grid_size != (grid.width, grid.height):
+        raise ValueError(f'save is for a {state.grid_size[0]}x{state.grid_size[1]} map')
+
+    player = level.player
+    player.pos.update(state.player_pos)
+    player.hitbox.center = player.pos
+    player.rect.center = player.hitbox.center
+    player.tool_index = state.tool_index % len(player.tools)
+    player.selected_tool = player.tools[player.tool_index]
+    player.seed_index = state.seed_index % len(player.seeds)
+    player.selected_seed = player.seeds[player.seed_index]
+    player.money = state.money
+    player.item_inventory.update(state.item_inventory) #Updated in place, the menu shares these dicts
+    player.seed_inventory.update(state.seed_inventory)
+
+    grid.cells = bytearray(state.grid)
+    for tile, index in zip(grid.cells_with(WATERED), state.water):
+        soil_layer.water_choices[tile] = soil_layer.water_surfs[index % len(soil_layer.water_surfs)]
+    for x, y, seed, age, progress in state.crops:
+        slot = soil_layer.crops.add(None, watered = grid.test(x, y, WATERED), age = age, progress = progress)
+        soil_layer.planted[(x, y)] = (slot, seed)
+
+    level.streamer.destroyed = set(state.destroyed)
+    level.streamer.health = dict(state.damaged)
+
+def pack_ids(ids):
+    #Sorted ids as varints of the gap to the previous id, objects placed one after another take a byte each
+    data = bytearray()
+    previous = 0
+    for value in sorted(ids):
+        gap, previous = value - previous, value
+        while gap >= 0x80:
+            data.append(gap & 0x7F | 0x80)
+            gap >>= 7
+        data.append(gap)
+    return bytes(data)
+
+def unpack_ids(data):
+    ids = []
+    previous = value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            previous += value
+            ids.append(previous)
+            value = shift = 0
+    return ids
+
+def pack_block(data):
+    return SIZE.pack(len(data)) + data
+
+def encode_snapshot(state):
+    damaged = sorted(state.damaged)
+    parts = [HEADER.pack(SAVE_MAGIC, SAVE_FORMAT_VERSION, state.player_pos[0], state.player_pos[1],
+                         state.tool_index, state.seed_index, state.money, state.grid_size[0], state.grid_size[1],
+                         len(state.item_inventory), len(state.seed_inventory), len(state.crops),
+                         len(state.destroyed), len(damaged))]
+    for inventory in (state.item_inventory, state.seed_inventory):
+        for name, amount in inventory.items():
+            parts.append(pack_string(name) + AMOUNT.pack(amount))
+    parts.append(pack_block(zlib.compress(state.grid))) #Mostly empty, compresses to a few hundred bytes
+    parts.append(pack_block(state.water))
+    for x, y, seed, age, progress in state.crops:
+        parts.append(CROP.pack(x, y, age, progress) + pack_string(seed))
+    parts.append(pack_block(pack_ids(state.destroyed)))
+    parts.append(pack_block(pack_ids(damaged)))
+    #Health fits a byte, a node at 0 or below is destroyed on its next update anyway
+    parts.append(array('B', (max(0, min(state.damaged[node_id], 255)) for node_id in damaged)).tobytes())
+    return b''.join(parts)
+
+def decode_snapshot(data):
+    magic, version, x, y, tool_index, seed_index, money, grid_width, grid_height, \
+        item_count, seed_count, crop_count, destroyed_count, damaged_count = HEADER.unpack_from(data, 0)
+    if magic != SAVE_MAGIC or version != SAVE_FORMAT_VERSION:
+        raise ValueError(f'not a save file of version {SAVE_FORMAT_VERSION}')
+    offset = HEADER.size
+
+    def read_string():
+        nonlocal offset
+        length, = STRING.unpack_from(data, offset)
+        offset += STRING.size + length
+        return bytes(data[offset - length:offset]).decode('utf-8')
+
+    def read_block():
+        nonlocal offset
+        length, = SIZE.unpack_from(data, offset)
+        offset += SIZE.size + length
+        return bytes(data[offset - length:offset])
+
+    state = SaveState()
+    state.player_pos = (x, y)
+    state.tool_index, state.seed_index, state.money = tool_index, seed_index, money
+    state.grid_size = (grid_width, grid_height)
+    for inventory, count in ((state.item_inventory, item_count), (state.seed_inventory, seed_count)):
+        for _ in range(count):
+            name = read_string()
+            inventory[name], = AMOUNT.unpack_from(data, offset)
+            offset += AMOUNT.size
+    state.grid = zlib.decompress(read_block())
+    if len(state.grid) != grid_width * grid_height:
+        raise ValueError('save file soil grid does not match its size')
+    state.water = read_block()
+    for _ in range(crop_count):
+        crop_x, crop_y, age, progress = CROP.unpack_from(data, offset)
+        offset += CROP.size
+        if crop_x >= grid_width or crop_y >= grid_height:
+            raise ValueError('save file has a crop outside its soil grid')
+        state.crops.append((crop_x, crop_y, read_string(), age, progress))
+    state.destroyed = unpack_ids(read_block())
+    damaged = unpack_ids(read_block())
+    health = data[offset:offset + damaged_count]
+    if len(state.destroyed) != destroyed_count or len(damaged) != damaged_count or len(health) != damaged_count:
+        raise ValueError('save file is truncated')
+    state.damaged = dict(zip(damaged, health))
+    return state
+
+def write_save(path, state):
+    #Write to a temporary file and swap it in, a crash mid-write leaves the previous save intact
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(encode_snapshot(state))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def load_save(path = SAVE_FILE, map_size = None):
+    #Saved state, None when there is no save, it is from another version or for a map of another size (width, height)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as file:
+        data = file.read()
+    try:
+        state = decode_snapshot(data)
+    except (ValueError, struct.error, zlib.error):
+        return None
+    if map_size and state.grid_size != tuple(map_size):
+        return None #The map was resized since the save, start a new game
+    return state
+
+#AutoSaver writes snapshots on a background thread so the frame loop never waits for the disk.
+#Only the newest snapshot is kept waiting, one taken while a write is running replaces the older one.
+class AutoSaver:
+    def __init__(self, path = SAVE_FILE):
+        self.path = path
+        self.waiting = None  #Snapshot to write next
+        self.closed = False
+        self.error = None  #Error of the last write, None once a write succeeds again
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target = self.run, name = 'autosave', daemon = True)
+        self.thread.start()
+
+    def save(self, state):
+        with self.condition:
+            self.waiting = state
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.waiting is None and not self.closed:
+                    self.condition.wait()
+                state, self.waiting = self.waiting, None
+            if state is None:
+                return
+            try:
+                write_save(self.path, state)
+                self.error = None
+            except OSError as error:
+                self.error = error #The next snapshot is tried anyway
+                print(f'autosave to {self.path} failed: {error}', file = sys.stderr)
+
+    def close(self):
+        #Finish the waiting snapshot and stop the thread, returns the error if the last write failed
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        return self.error
@@ -1,3 +1,4 @@
+import pygame
 from pygame.math import Vector2
 # screen
 SCREEN_WIDTH = 1280
@@ -6,7 +7,7 @@ TILE_SIZE = 64
 NEW_TILE_SIZE = 16
 UPSCALE_FACTOR = 4
 NEW_TILE_SIZE_UPSCALED = NEW_TILE_SIZE * UPSCALE_FACTOR
-GROWTH_TIME = 10
+GROWTH_TIME = 10 # seconds a watered plant needs to grow one stage
 FPS = 60
 NUM_STAGES = 4
 
@@ -38,6 +39,80 @@ LAYERS = {
     'Main': 12,
 }
 
+#Layers whose sprites overlap and must be drawn in their vertical order
+Y_SORT_LAYERS = (LAYERS['Plant'], LAYERS['Main'])
+
+# static layer chunks
+STATIC_CHUNK_SIZE = 512
+STATIC_CHUNK_CACHE_SIZE = 64
+
+# world streaming, sprites only exist for the square chunks of the map around the player
+STREAM_CHUNK_TILES = 16 # chunk width and height in tiles
+STREAM_MARGIN = 256 # world pixels around the screen that are loaded before they come into view
+STREAM_MAX_CHUNKS = 20 # loaded chunks kept at most, the farthest ones are unloaded first
+
+# level, MAP_FILE is compiled into a binary file with LEVEL_FILE_EXTENSION next to it
+MAP_FILE = 'MAP.tmx'
+LEVEL_FILE_EXTENSION = '.lvl'
+
+# asset cache, memory cap in bytes for loaded images (None for no limit)
+ASSET_CACHE_MAX_BYTES = None
+
+# startup loading, number of threads decoding images
+LOADER_WORKERS = 4
+
+# saving, the game is saved to SAVE_FILE every AUTOSAVE_INTERVAL seconds of play and when it is closed
+SAVE_FILE = 'save.dat'
+AUTOSAVE_INTERVAL = 60
+
+# input recording, the seed, key presses and frame times of a session are written to RECORD_FILE
+# and can be replayed with: python replay.py <file> [--render]
+RECORD_FILE = None # path of the recording, None to not record
+
+# particles, how long the flash of a destroyed object lasts in milliseconds
+PARTICLE_DURATION = 200
+
+# spatial index
+SPATIAL_CELL_SIZE = 128
+
+# action names used for injected input and the keys they stand for
+KEY_BINDINGS = {
+	'up': pygame.K_w,
+	'down': pygame.K_s,
+	'left': pygame.K_a,
+	'right': pygame.K_d,
+	'tool': pygame.K_SPACE,
+	'switch tool': pygame.K_q,
+	'seed': pygame.K_LCTRL,
+	'shop': pygame.K_m,
+	'instructions': pygame.K_i,
+	'close': pygame.K_ESCAPE,
+	'profiler': pygame.K_F3,
+}
+
+# held actions repeat after a delay, in seconds (used to scroll the menu)
+INPUT_REPEAT_DELAY = 0.4
+INPUT_REPEAT_INTERVAL = 0.2
+
+# headless simulation step in seconds
+SIMULATION_DT = 1 / FPS
+
+# ui, number of rendered text strings kept per font
+UI_TEXT_CACHE_SIZE = 64
+
+# frame pacing, updates run in SIMULATION_DT steps and the drawing is interpolated between them
+FIXED_TIMESTEP = True # False runs one update per frame with the measured frame time
+UNCAPPED_FPS = False # draw as fast as possible instead of at FPS
+MENU_FPS = 30 # frame rate while the shop or instructions are open
+BACKGROUND_FPS = 10 # frame rate while the window is not focused
+MAX_FRAME_TIME = 0.25 # longest frame time in seconds the game catches up on, after a stall the rest is dropped
+
+# frame profiler, shown with the 'profiler' key, frame timings can also be streamed to a .csv or .jsonl file
+PROFILER_HISTORY = 600 # frames kept in the ring buffer for the rolling percentiles
+PROFILER_OVERLAY_REFRESH = 15 # frames between redraws of the overlay text
+PROFILER_FLUSH_FRAMES = 60 # frames between writes to the export file
+PROFILER_EXPORT_FILE = None # path of the export file, None to only profile on screen
+
 SALE_PRICES = {
 	'Wood': 4,
 	'Stone': 2,
@@ -0,0 +1,44 @@
+import os
+import sys
+import pygame
+from settings import *
+
+def init_display():
+    #Use the dummy video driver unless a window already exists
+    if not pygame.display.get_init():
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+#Simulation runs the level without a window at a fixed timestep, with scripted input and a seeded RNG.
+#The same seed and action script give the same game state every run, for tests, benchmarks and bots.
+class Simulation:
+    def __init__(self, seed = 0, render = False, level_data = None):
+        init_display()
+        from spritelayer import Level #Needs the display to be set up first
+        self.render = render #Draw every step, only needed when frames are looked at
+        self.level = Level(level_data, seed)
+        self.frame = 0 #Number of steps run
+
+    def step(self, dt = SIMULATION_DT, actions = ()):
+        #Advance the game by one fixed step with the given actions held down
+        self.level.controls.set_actions(actions)
+        self.level.update(dt)
+        if self.render:
+            self.level.draw()
+        self.frame += 1
+
+    def run(self, seconds, actions = (), dt = SIMULATION_DT):
+        #Hold the same actions for a number of game seconds
+        for _ in range(round(seconds / dt)):
+            self.step(dt, actions)
+
+#Runs a headless session from the command line: python simulation.py [seconds] [seed]
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    simulation = Simulation(seed)
+    simulation.run(seconds)
+    player = simulation.level.player
+    print(f'{simulation.frame} steps, player at {player.pos.x:.1f}, {player.pos.y:.1f}')
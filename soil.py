@@ -1,8 +1,53 @@
 import pygame
 from settings import *
-from pytmx.util_pygame import load_pygame
 from support import *
-from random import choice
+from crops import CropField
+
+#Bit flags stored for every cell of the soil grid
+FARMABLE = 1  #Soil can be tilled here (Farmable layer of the map)
+TILLED = 2  #Soil has been hit with the hoe
+WATERED = 4  #Soil has been watered
+PLANTED = 8  #A plant is growing here
+
+#Soil graphic for every combination of tilled neighbours,
+#indexed by a 4-bit mask where top = 1, right = 2, bottom = 4 and left = 8
+SOIL_TILE_TYPES = ('o', 'b', 'l', 'bl', 't', 'tb', 'tl', 'tbr', 'r', 'br', 'lr', 'lrb', 'tr', 'tbl', 'lrt', 'x')
+
+class SoilGrid:
+    def __init__(self, width, height):
+        self.width = width  #Grid width in tiles, same as the map
+        self.height = height  #Grid height in tiles, same as the map
+        self.cells = bytearray(width * height)  #One byte of flags per tile, row by row
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def set(self, x, y, flag):
+        self.cells[y * self.width + x] |= flag  #Turn the flag on
+
+    def clear(self, x, y, flag):
+        self.cells[y * self.width + x] &= ~flag & 0xFF  #Turn the flag off
+
+    def test(self, x, y, flag):
+        #Tiles outside the map have no flags
+        return self.in_bounds(x, y) and bool(self.cells[y * self.width + x] & flag)
+
+    def neighbour_mask(self, x, y, flag):
+        #4-bit mask of which of the four neighbours have the flag (top = 1, right = 2, bottom = 4, left = 8)
+        return (self.test(x, y - 1, flag)
+                | self.test(x + 1, y, flag) << 1
+                | self.test(x, y + 1, flag) << 2
+                | self.test(x - 1, y, flag) << 3)
+
+    def clear_all(self, flag):
+        #Turn a flag off on every tile in a single pass
+        self.cells = self.cells.translate(bytes(value & ~flag & 0xFF for value in range(256)))
+
+    def cells_with(self, flag):
+        #Positions (x, y) of every tile that has the flag
+        for index, value in enumerate(self.cells):
+            if value & flag:
+                yield index % self.width, index // self.width
 
 class SoilTile(pygame.sprite.Sprite):
     def __init__(self, pos, surf, groups):
@@ -19,181 +64,184 @@ class WaterTile(pygame.sprite.Sprite):
         self.z = LAYERS['Watered Soil']  #Set the rendering layer order for the water tiles
 
 class Plant(pygame.sprite.Sprite):
-    def __init__(self, plant_type, groups, soil, check_watered):
+    def __init__(self, plant_type, groups, soil, age = 0):
         super().__init__(groups)  #Register the plant in sprite groups
         self.plant_type = plant_type  #Define the plant type
         self.frames = import_folder('graphics/fruit/corn')  #Load all frames for plant growth stages
         self.soil = soil  #The soil object where the plant is growing
-        self.check_watered = check_watered  #Function to check if the plant is watered
+        self.slot = None  #Index of the plant's growth state in the crop field
 
-        self.age = 0  #Initial age of the plant (starting at 0)
         self.max_age = len(self.frames) - 1  #Maximum age corresponds to the number of growth stages
-        self.harvestable = False  #Initially, the plant is not harvestable
-
-        self.image = self.frames[self.age]  #Set the initial image/frame for the plant
         self.y_offset = -16  #Y offset to position the plant above the soil tile
-        self.rect = self.image.get_rect(midbottom=soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))  #Position the plant above the soil
         self.z = LAYERS['Plant']  #Set the z-order for rendering the plant (higher than soil)
+        self.set_age(age)  #Set the image/frame for the plant's growth stage
 
+    def set_age(self, age):
+        # Called by the crop field when the plant reaches a new growth stage
+        self.age = age
+        self.image = self.frames[self.age]  # Change the plant's image to the growth stage
+        self.rect = self.image.get_rect(midbottom=self.soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))  # Update position based on growth
 
-    def grow(self):
-        # Check if the plant is watered by calling check_watered function
-        if self.check_watered(self.rect.center):
-            # If the plant is not fully grown, it will grow to the next stage
-            if self.age < self.max_age:
-                self.age += 1  # Increase the plant age
-                self.image = self.frames[self.age]  # Change the plant's image to the next growth stage
-                self.rect = self.image.get_rect(midbottom=self.soil.rect.midbottom + pygame.math.Vector2(0, self.y_offset))  # Update position based on growth
-
-            # Once fully grown, the plant becomes harvestable
-            if self.age == self.max_age:
-                self.harvestable = True
+        # Once fully grown, the plant becomes harvestable
+        self.harvestable = self.age == self.max_age
 
 class SoilLayer:
-    def __init__(self, all_sprites):
+    def __init__(self, all_sprites, level_data, random, clock):
         #Sprite groups
         self.all_sprites = all_sprites
+        self.random = random  # Random number generator shared with the level
         self.soil_sprites = pygame.sprite.Group()
         self.water_sprites = pygame.sprite.Group()
         self.plant_sprites = pygame.sprite.Group()
+        # Objects of every tile, looked up by (x, y) tile position
+        # Sprites only exist for the loaded part of the map, see load_area and unload_area
+        self.soil_tiles = {}  # SoilTile sprite of each loaded tilled tile
+        self.water_tiles = {}  # WaterTile sprite of each loaded watered tile
+        self.plants = {}  # Plant sprite on each loaded planted tile
+        self.water_choices = {}  # Water graphic of every watered tile, the same one comes back after an unload
+        self.planted = {}  # (crop slot, seed) of every planted tile
 
         #Graphics
         self.soil_surfs = import_folder_dict('graphics/soil')
         self.water_surfs = import_folder('graphics/soil_water')
 
-        self.grid = self.create_soil_grid()
-        self.create_hit_rects()
+        # Growth of every plant, over time while its tile is watered
+        self.crops = CropField(clock, max_age = len(import_folder('graphics/fruit/corn')) - 1)
+
+        self.grid = self.create_soil_grid(level_data)
 
-    def create_soil_grid(self):
-        h_tiles = 100
-        v_tiles = 80
+    def create_soil_grid(self, level_data):
+        #The grid has one cell per map tile
+        grid = SoilGrid(level_data.width, level_data.height)
 
-        #Initialize the grid as a 2D list of lists
-        grid = [[[] for _ in range(h_tiles)] for _ in range(v_tiles)]
-        
-        #Load the tile map and populate the grid
-        for x, y, _ in load_pygame('MAP.tmx').get_layer_by_name('Farmable').tiles():
-            if 0 <= x < h_tiles and 0 <= y < v_tiles:  #Ensure x and y are within bounds
-                grid[y][x].append('F')  #Set the cell to contain 'F'
+        #Mark the tiles of the Farmable layer
+        for x, y in level_data.tile_positions('Farmable'):
+            if grid.in_bounds(x, y):  #Ensure x and y are within bounds
+                grid.set(x, y, FARMABLE)
 
         return grid
     
-    def create_hit_rects(self):
-        self.hit_rects = []  # List to store collision rectangles for the soil tiles
-        # Iterate over the soil grid and create a rectangle for each valid soil tile ('F' in grid)
-        for index_row, row in enumerate(self.grid):
-            for index_col, cell in enumerate(row):
-                if 'F' in cell:
-                    x = index_col * TILE_SIZE  # Calculate x position for the tile
-                    y = index_row * TILE_SIZE  # Calculate y position for the tile
-                    rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)  # Create rectangle for the tile
-                    self.hit_rects.append(rect)  # Add rectangle to the list
+    def get_tile(self, pos):
+        # Tile position (x, y) under a world position
+        return int(pos[0] // TILE_SIZE), int(pos[1] // TILE_SIZE)
 
     def get_hit(self, point):
-        # Check if any of the soil hit rectangles are clicked (colliding with point)
-        for rect in self.hit_rects:
-            if rect.collidepoint(point):  # If the point collides with this rectangle
-                x = rect.x // TILE_SIZE  # Get x coordinate in grid
-                y = rect.y // TILE_SIZE  # Get y coordinate in grid
-                if 0 <= y < len(self.grid) and 0 <= x < len(self.grid[0]):
-                    if 'F' in self.grid[y][x]:  # If the tile is farmable ('F')
-                        self.grid[y][x].append('X')  # Mark it as clicked ('X')
-                        self.create_soil_tiles()  # Recreate the soil tiles after modification
+        # Till the tile under the point if it is farmable
+        x, y = self.get_tile(point)
+        if self.grid.test(x, y, FARMABLE) and not self.grid.test(x, y, TILLED):  # If the tile is farmable and not tilled yet
+            self.grid.set(x, y, TILLED)  # Mark it as tilled
+            self.update_soil_tiles(x, y)  # Update the soil tiles around the modification
     
     def water(self, target_pos):
-    # Water the soil at the specified position
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_pos):  # If the water target intersects with a soil tile
-                x = soil_sprite.rect.x // TILE_SIZE  # Get x coordinate of the tile in the grid
-                y = soil_sprite.rect.y // TILE_SIZE  # Get y coordinate of the tile in the grid
-                self.grid[y][x].append('W')  # Add water marker 'W' to the tile in the grid
+        # Water the soil tile under the target position
+        x, y = self.get_tile(target_pos)
+        soil_sprite = self.soil_tiles.get((x, y))
+        if soil_sprite:  # If the water target is a tilled soil tile
+            self.grid.set(x, y, WATERED)  # Mark the tile as watered in the grid
 
-                pos = soil_sprite.rect.topleft  # Get the top-left position of the soil sprite
-                surf = choice(self.water_surfs)  # Randomly choose a water tile graphic
-                WaterTile(pos, surf, [self.all_sprites, self.water_sprites])  # Create a water tile sprite
+            if (x, y) not in self.water_tiles:  # Only one water tile sprite per tile
+                self.water_choices[(x, y)] = self.random.choice(self.water_surfs)  # Randomly choose a water tile graphic
+                self.create_water_tile(x, y)
 
-                self.update_plants()  # Update the plants after watering
+            if (x, y) in self.planted:
+                self.crops.water(self.planted[(x, y)][0])  # The plant on the tile starts growing
+
+    def create_water_tile(self, x, y):
+        pos = (x * TILE_SIZE, y * TILE_SIZE)  # Same top-left position as the soil tile
+        self.water_tiles[(x, y)] = WaterTile(pos, self.water_choices[(x, y)], [self.all_sprites, self.water_sprites])
 
     def remove_water(self):
         # Remove all water tiles (sprites) and update the grid
         for sprite in self.water_sprites.sprites():
             sprite.kill()  # Remove the water sprite
+        self.water_tiles.clear()
+        self.water_choices.clear()
 
-        # Clean up water markers in the soil grid
-        for row in self.grid:
-            for cell in row:
-                if 'W' in cell:
-                    cell.remove('W')  # Remove the 'W' marker indicating water
-
-    def check_watered(self, pos):
-        # Check if the given position has been watered (contains 'W' in the grid)
-        x = pos[0] // TILE_SIZE  # Get the x index in the grid
-        y = pos[1] // TILE_SIZE  # Get the y index in the grid
-        cell = self.grid[y][x]  # Access the cell in the grid
-        is_watered = 'W' in cell  # Check if it has a 'W' (water) marker
-        return is_watered  # Return True or False based on whether the cell is watered
+        # Clean up water flags in the soil grid, every plant stops growing
+        self.grid.clear_all(WATERED)
+        self.crops.dry_all()
 
     def plant_seed(self, target_pos, seed):
-        # Plant a seed at the specified position, provided the position isn't occupied by another plant
-        for soil_sprite in self.soil_sprites.sprites():
-            if soil_sprite.rect.collidepoint(target_pos):  # If a soil tile is clicked
-                x = soil_sprite.rect.x // TILE_SIZE  # Get x coordinate of the tile
-                y = soil_sprite.rect.y // TILE_SIZE  # Get y coordinate of the tile
-
-                # Ensure the tile is empty ('P' not present) before planting
-                if 'P' not in self.grid[y][x]:
-                    self.grid[y][x].append('P')  # Mark the tile with 'P' for plant
-                    # Create a new plant (seed) on the soil, passing in the check_watered function
-                    Plant(seed, [self.all_sprites, self.plant_sprites], soil_sprite, self.check_watered)
+        # Plant a seed on the soil tile under the target position, provided it isn't occupied by another plant
+        x, y = self.get_tile(target_pos)
+        soil_sprite = self.soil_tiles.get((x, y))
+        if soil_sprite and not self.grid.test(x, y, PLANTED):  # Ensure the tile is tilled and empty before planting
+            self.grid.set(x, y, PLANTED)  # Mark the tile as planted
+            # Create a new plant (seed) on the soil, it grows right away on watered soil
+            plant = Plant(seed, [self.all_sprites, self.plant_sprites], soil_sprite)
+            slot = self.crops.add(plant, watered = self.grid.test(x, y, WATERED))
+            self.plants[(x, y)] = plant
+            self.planted[(x, y)] = (slot, seed)
+
+    def remove_plant(self, x, y):
+        # Take the plant off its tile, the sprite itself is killed by the caller
+        self.plants.pop((x, y), None)
+        if (x, y) in self.planted:
+            self.crops.remove(self.planted.pop((x, y))[0])
+        self.grid.clear(x, y, PLANTED)
+
+    def plants_near(self, rect):
+        # Plants on the tiles around rect, a plant can reach into the tile above its own
+        left, top = self.get_tile(rect.topleft)
+        right, bottom = self.get_tile(rect.bottomright)
+        plants = []
+        for y in range(top - 1, bottom + 2):
+            for x in range(left - 1, right + 2):
+                plant = self.plants.get((x, y))
+                if plant:
+                    plants.append(plant)
+        return plants
     
-    def update_plants(self):
-        # Update all plants' growth
-        for plant in self.plant_sprites.sprites():
-            plant.grow()  # Call the grow method for each plant, which updates their growth stages
-
+    def update(self):
+        # Grow the plants whose next stage is due
+        self.crops.update()
 
     def create_soil_tiles(self):
-        # Rebuild the soil tiles based on the grid configuration
-        self.soil_sprites.empty()  # Clear the existing soil sprites
-        for index_row, row in enumerate(self.grid):  # Iterate through the grid
-            for index_col, cell in enumerate(row):
-                if 'X' in cell:  # If the cell is farmable
-                    
-                    #tile options
-                    t = 'X' in self.grid[index_row - 1][index_col]
-                    b = 'X' in self.grid[index_row + 1][index_col]
-                    r = 'X' in row[index_col + 1]
-                    l = 'X' in row[index_col - 1]
-
-                    tile_type = 'o'
-
-					# all sides
-                    if all((t,r,b,l)): tile_type = 'x'
-
-                    # horizontal tiles only
-                    if l and not any((t,r,b)): tile_type = 'r'
-                    if r and not any((t,l,b)): tile_type = 'l'
-                    if r and l and not any((t,b)): tile_type = 'lr'
-
-                    # vertical only 
-                    if t and not any((r,l,b)): tile_type = 'b'
-                    if b and not any((r,l,t)): tile_type = 't'
-                    if b and t and not any((r,l)): tile_type = 'tb'
-
-                    # corners 
-                    if l and b and not any((t,r)): tile_type = 'tr'
-                    if r and b and not any((t,l)): tile_type = 'tl'
-                    if l and t and not any((b,r)): tile_type = 'br'
-                    if r and t and not any((b,l)): tile_type = 'bl'
-
-                    # T shapes
-                    if all((t,b,r)) and not l: tile_type = 'tbr'
-                    if all((t,b,l)) and not r: tile_type = 'tbl'
-                    if all((l,r,t)) and not b: tile_type = 'lrb'
-                    if all((l,r,b)) and not t: tile_type = 'lrt'
-
-                    SoilTile(
-                        pos=(index_col * TILE_SIZE, index_row * TILE_SIZE),
-                        surf=self.soil_surfs[tile_type],
-                        groups=[self.all_sprites, self.soil_sprites]
-                    )
\ No newline at end of file
+        # Bring every tilled tile of the grid up to date
+        for x, y in self.grid.cells_with(TILLED):
+            self.update_soil_tile(x, y)
+
+    def update_soil_tiles(self, x, y):
+        # Tilling a tile only changes the shape of that tile and its four neighbours
+        for tile_x, tile_y in ((x, y), (x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)):
+            if self.grid.test(tile_x, tile_y, TILLED):
+                self.update_soil_tile(tile_x, tile_y)
+
+    def update_soil_tile(self, x, y):
+        # Pick the graphic from the tilled neighbours and update the sprite in place
+        surf = self.soil_surfs[SOIL_TILE_TYPES[self.grid.neighbour_mask(x, y, TILLED)]]
+        soil_tile = self.soil_tiles.get((x, y))
+        if soil_tile:
+            soil_tile.image = surf
+        else:
+            self.soil_tiles[(x, y)] = SoilTile(
+                pos=(x * TILE_SIZE, y * TILE_SIZE),
+                surf=surf,
+                groups=[self.all_sprites, self.soil_sprites]
+            )
+
+    def load_area(self, left, top, size):
+        # Create the soil, water and plant sprites of a square of tiles coming into the loaded world
+        for y in range(top, min(top + size, self.grid.height)):
+            for x in range(left, min(left + size, self.grid.width)):
+                if not self.grid.test(x, y, TILLED):
+                    continue
+                self.update_soil_tile(x, y)
+                if (x, y) in self.water_choices and (x, y) not in self.water_tiles:
+                    self.create_water_tile(x, y)
+                if (x, y) in self.planted and (x, y) not in self.plants:
+                    slot, seed = self.planted[(x, y)]
+                    plant = Plant(seed, [self.all_sprites, self.plant_sprites], self.soil_tiles[(x, y)], self.crops.age[slot])
+                    self.crops.attach(slot, plant)  # Grows on from where the crop field has it
+                    self.plants[(x, y)] = plant
+
+    def unload_area(self, left, top, size):
+        # Kill the sprites of a square of tiles, the grid and the crop field keep their state
+        for y in range(top, min(top + size, self.grid.height)):
+            for x in range(left, min(left + size, self.grid.width)):
+                for sprites in (self.soil_tiles, self.water_tiles, self.plants):
+                    sprite = sprites.pop((x, y), None)
+                    if sprite:
+                        sprite.kill()
+                if (x, y) in self.planted:
+                    self.crops.attach(self.planted[(x, y)][0], None)
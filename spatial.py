@@ -0,0 +1,116 @@
+import pygame
+from settings import *
+
+#PendingIndex is mixed into sprite groups that index their sprites by rect or z-layer.
+#Sprites join a group before their rect and z are set, so new sprites wait in a pending list
+#and are indexed on the next lookup. Subclasses define index(sprite), which returns where the
+#sprite was stored (None if it can't be indexed yet), and unindex(sprite, where).
+#The indexes hold sprites as keys of dicts used as ordered sets: iteration follows the order
+#sprites were added, which is their draw order, and removing one is O(1).
+class PendingIndex:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.indexed = {} #Sprite -> where index() stored it
+        self.pending = [] #Sprites added since the last index_pending
+
+    def add_internal(self, sprite, layer = None):
+        super().add_internal(sprite, layer)
+        self.pending.append(sprite)
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        if sprite in self.indexed:
+            self.unindex(sprite, self.indexed.pop(sprite))
+
+    def index_pending(self):
+        for sprite in self.pending:
+            if sprite in self.spritedict and sprite not in self.indexed:
+                where = self.index(sprite)
+                if where is not None:
+                    self.indexed[sprite] = where
+        self.pending.clear()
+
+#SpatialGroup is a sprite group that also keeps its sprites in a uniform grid.
+#Lookups only visit the grid cells a rect or point touches instead of every sprite in the group.
+class SpatialGroup(PendingIndex, pygame.sprite.Group):
+    def __init__(self, cell_size = SPATIAL_CELL_SIZE, rect_attr = 'hitbox'):
+        super().__init__()
+        self.cell_size = cell_size #Width and height of a grid cell in world pixels
+        self.rect_attr = rect_attr #Which rect of the sprite is indexed ('hitbox' or 'rect')
+
+        self.cells = {} #(cell_x, cell_y) -> sprites overlapping that cell
+
+    def cell_range(self, rect):
+        #Cell coordinates covered by a world rect
+        size = self.cell_size
+        return (range(rect.left // size, (rect.right - 1) // size + 1),
+                range(rect.top // size, (rect.bottom - 1) // size + 1))
+
+    def index(self, sprite):
+        rect = getattr(sprite, self.rect_attr, None)
+        if rect is None:
+            return None
+        cols, rows = self.cell_range(rect)
+        keys = [(x, y) for y in rows for x in cols]
+        for key in keys:
+            self.cells.setdefault(key, {})[sprite] = None
+        return keys
+
+    def unindex(self, sprite, keys):
+        for key in keys:
+            cell = self.cells[key]
+            del cell[sprite]
+            if not cell:
+                del self.cells[key]
+
+    def query(self, rect):
+        #Sprites in the cells overlapped by rect, each one once
+        if self.pending:
+            self.index_pending()
+        cols, rows = self.cell_range(rect)
+        found = {}
+        for y in rows:
+            for x in cols:
+                cell = self.cells.get((x, y))
+                if cell:
+                    found.update(cell)
+        return list(found)
+
+    def at_point(self, point):
+        #Sprites whose indexed rect contains point, only looks at the one cell under it
+        if self.pending:
+            self.index_pending()
+        cell = self.cells.get((int(point[0] // self.cell_size), int(point[1] // self.cell_size)))
+        if not cell:
+            return []
+        return [sprite for sprite in cell if getattr(sprite, self.rect_attr).collidepoint(point)]
+
+#CollisionGrid stores a blocked/free flag per map tile in a bytearray.
+#Blocked tiles have no sprite or surface, their solid area is computed from the tile position when needed.
+class CollisionGrid:
+    def __init__(self, width, height, tile_size = TILE_SIZE):
+        self.width = width #Map width in tiles
+        self.height = height #Map height in tiles
+        self.tile_size = tile_size
+        self.blocked = bytearray(width * height) #1 where the tile blocks movement
+
+        #Solid area inside a blocked tile, the same shrunken hitbox a Generic sprite of that tile would get
+        tile_rect = pygame.Rect(0, 0, tile_size, tile_size)
+        self.solid_rect = tile_rect.inflate(-tile_rect.width * 0.2, -tile_rect.height * 0.75)
+
+    def set_blocked(self, x, y, blocked = True):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.blocked[y * self.width + x] = blocked
+
+    def query(self, rect):
+        #Solid rects of the blocked tiles overlapped by rect, row by row
+        size = self.tile_size
+        left, right = max(rect.left // size, 0), min((rect.right - 1) // size, self.width - 1)
+        top, bottom = max(rect.top // size, 0), min((rect.bottom - 1) // size, self.height - 1)
+        rects = []
+        for y in range(top, bottom + 1):
+            row = y * self.width
+            for x in range(left, right + 1):
+                if self.blocked[row + x]:
+                    rects.append(self.solid_rect.move(x * size, y * size))
+        return rects
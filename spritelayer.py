@@ -3,144 +3,113 @@ import random
 from settings import *
 from player import *
 from sprites import *
-from pytmx.util_pygame import load_pygame
+from level_data import load_level
 from support import *
 from soil import *
 from inventory import *
 from ui import Overlay
+from chunks import StaticChunkGroup, WaterLayer
+from spatial import PendingIndex, SpatialGroup, CollisionGrid
+from controls import InputManager
+from timer import GameClock
+from profiler import FrameProfiler
+from particles import ParticleSystem
+from streaming import WorldStreamer
+from savegame import restore_snapshot, take_snapshot
 
 
 class Level:
-    def __init__(self):
+    def __init__(self, level_data = None, seed = None, save = None):
         #Get Game's Display Surface
         self.display_surface = pygame.display.get_surface()
 
+        #Random numbers for item drops and watered soil, a fixed seed makes a session repeatable
+        self.random = random.Random(seed)
+
+        #Game time of this level, runs the timers of the player, crops and particles
+        self.clock = GameClock()
+
+        #Actions from the keyboard or injected input, sent to the player, shop or instructions
+        self.controls = InputManager(self.input_context)
+
         #Sprites Groups
         self.all_sprites = CameraGroup() #Calls CameraGroup class
-        self.collision_sprites = pygame.sprite.Group() #Collision
-        self.log_sprites = pygame.sprite.Group() #Logs To Be Collected
-        self.rock_sprites = pygame.sprite.Group() #Rocks To Be Collected
-        self.grass_sprites = pygame.sprite.Group() #Grass To Be Collected
+        self.collision_sprites = SpatialGroup() #Collision, indexed by hitbox in a grid
+        self.log_sprites = SpatialGroup(rect_attr = 'rect') #Logs To Be Collected, indexed by position for tool hits
+        self.rock_sprites = SpatialGroup(rect_attr = 'rect') #Rocks To Be Collected
+        self.grass_sprites = SpatialGroup(rect_attr = 'rect') #Grass To Be Collected
         self.interaction_sprites = pygame.sprite.Group() #Object to Interact
 
+        #Compiled map, parsed once and shared by everything that reads the map
+        self.level_data = level_data or load_level(MAP_FILE)
+
         #Soil Layer, Manages Soil and Farming
-        self.soil_layer = SoilLayer(self.all_sprites)
+        self.soil_layer = SoilLayer(self.all_sprites, self.level_data, self.random, self.clock)
 
-        #Calls Setup Method
-        self.setup()
+        #Calls Setup Method, a saved game is restored before any of the world is created
+        self.setup(save)
 
         #UI Elements above all of the sprites group above
         self.overlay = Overlay(self.player) #Tool Overlay
-        self.menu = Menu(self.player, self.toggle_shop) #In-game Menu/Inventory
+        self.menu = Menu(self.player, self.toggle_shop, self.controls) #In-game Menu/Inventory
         self.show_instructions = False #Indicates whether variable should be visible
         self.instruction = Instructions(self.player, self.toggle_instructions) #In-game Instructions
+        self.controls.subscribe('instructions', self.instruction.on_action)
         self.shop_active = False #Indicates whether variable should be visible
 
-    def setup(self):
-        #With pytmx.util_pygame module, this loads the map file
-        tmx_data = load_pygame('MAP.tmx')
+        #World frame drawn when a menu opened, the world does not change until it closes
+        self.paused_frame = None
+
+        #Player position before the last update, the drawing is interpolated from there
+        self.previous_player_pos = self.player.pos.copy()
 
-        #Loads Water tile layer
+        #Frame phase timings and sprite counts, off until toggled on
+        self.profiler = FrameProfiler(self.sprite_counts)
+
+    def setup(self, save = None):
+        #The map loaded in __init__
+        level_data = self.level_data
+
+        #Loads Water tile layer as a single animated layer
         water_frames = import_folder('graphics/water')
-        for x,y, surf in tmx_data.get_layer_by_name('Water').tiles():
-            Water((x*TILE_SIZE, y*TILE_SIZE), water_frames, self.all_sprites)
-                #Tile positions is scaled by TILE_SIZE 
-                #Animations set as water_frames
-                #The water tiles are added to the all_sprites group for rendering
-
-        #Loads Decorations tile layer
-        for x, y, surf in tmx_data.get_layer_by_name('Decorations').tiles():
-            upscaled_surf = pygame.transform.scale(surf, (surf.get_width() * UPSCALE_FACTOR, surf.get_height() * UPSCALE_FACTOR))
-                #Upscales surface with UPSCALE_FACTOR, from 16-bit pixels
-            Generic((x * NEW_TILE_SIZE_UPSCALED, y * NEW_TILE_SIZE_UPSCALED), upscaled_surf, [self.all_sprites, self.collision_sprites])
-                #Set as Generic Object, positions it, and adds it to sprite group
-                #all_sprites: group to render the decoration
-                #collision_sprites: group for enabling collision with the decoration
-
-        #load Decorations2 which overlaps Decorations
-        for x, y, surf in tmx_data.get_layer_by_name('Decorations2').tiles():
-            upscaled_surf = pygame.transform.scale(surf, (surf.get_width() * UPSCALE_FACTOR, surf.get_height() * UPSCALE_FACTOR))
-            Generic((x * NEW_TILE_SIZE_UPSCALED, y * NEW_TILE_SIZE_UPSCALED), upscaled_surf, [self.all_sprites, self.collision_sprites])
-
-        #Loads Fences
-        for x, y, surf in tmx_data.get_layer_by_name('Fences').tiles():
-            upscaled_surf = pygame.transform.scale(surf, (surf.get_width() * UPSCALE_FACTOR, surf.get_height() * UPSCALE_FACTOR))
-            Generic((x * NEW_TILE_SIZE_UPSCALED, y * NEW_TILE_SIZE_UPSCALED), upscaled_surf, [self.all_sprites, self.collision_sprites])
-
-        #Loads Logs and make it Interactive
-        for obj in tmx_data.get_layer_by_name('Logs'):
-            #Upscale surface image by UPSCALE_FACTOR, making it bigger
-            upscaled_surf = pygame.transform.scale(obj.image, 
-                (obj.image.get_width() * UPSCALE_FACTOR, 
-                obj.image.get_height() * UPSCALE_FACTOR))
-            
-            #Upscales the position by UPSCALE_FACTOR, so it could match the upsized game world
-            upscaled_position = (obj.x * UPSCALE_FACTOR, obj.y * UPSCALE_FACTOR)
-
-            #Set as Log_Class from sprite.py, upscaling the position and surfaces
-            #log_sprites: Adds log sprite and Handles the interaction
-            Log_Class(pos = upscaled_position, 
-                      surf = upscaled_surf, 
-                      groups = [self.all_sprites, self.collision_sprites, self.log_sprites],
-                      player_add = self.player_add) #Adds item to inventory
-
-        #Loads Rocks and make it Interactive
-        for obj in tmx_data.get_layer_by_name('Rocks'):
-            upscaled_surf = pygame.transform.scale(obj.image, 
-                (obj.image.get_width() * UPSCALE_FACTOR, 
-                obj.image.get_height() * UPSCALE_FACTOR))
-            
-            upscaled_position = (obj.x * UPSCALE_FACTOR, obj.y * UPSCALE_FACTOR)
-
-            Rock_Class(pos = upscaled_position, 
-                       surf = upscaled_surf, 
-                       groups = [self.all_sprites, self.collision_sprites, self.rock_sprites],
-                       player_add = self.player_add)
-
-        #Loads Grass and make it Interactive
-        for obj in tmx_data.get_layer_by_name('Grass'):
-            upscaled_surf = pygame.transform.scale(obj.image, 
-                (obj.image.get_width() * UPSCALE_FACTOR, 
-                obj.image.get_height() * UPSCALE_FACTOR))
-            
-            upscaled_position = (obj.x * UPSCALE_FACTOR, obj.y * UPSCALE_FACTOR)
-
-            Grass_Class(pos = upscaled_position, 
-                        surf = upscaled_surf, 
-                        groups = [self.all_sprites, self.collision_sprites, self.grass_sprites],
-                        player_add = self.player_add)
-
-        #Loads Land Barrier, making player not be able to go through it, Inherits Generic
-        for x,y,surf in tmx_data.get_layer_by_name('Collisions').tiles():
-            Generic((x * NEW_TILE_SIZE_UPSCALED, y * NEW_TILE_SIZE_UPSCALED), pygame.Surface((NEW_TILE_SIZE_UPSCALED, NEW_TILE_SIZE_UPSCALED)), self.collision_sprites)
+        water_tiles = list(level_data.tile_positions('Water'))
+        self.water = WaterLayer(water_tiles, water_frames)
+        self.all_sprites.add_renderer(self.water)
+            #All water tiles share one animation clock
+            #The layer is drawn and updated by all_sprites
+
+        #Flashes of destroyed objects, updated and drawn by all_sprites like the water
+        self.particles = ParticleSystem(self.clock)
+        self.all_sprites.add_renderer(self.particles)
+
+        #Loads Land Barrier into a tile grid, making player not be able to go through it
+        self.collision_grid = CollisionGrid(level_data.width, level_data.height)
+        for x,y in level_data.tile_positions('Collisions'):
+            self.collision_grid.set_blocked(x, y)
 
         #Loads Player in game and in the SpawnPoint, already set through the tmx file
-        for obj in tmx_data.get_layer_by_name('Player'):
-            if obj.name == 'SpawnPoint':
-                #Player position is upscaled, adjusting it to the world
-                self.player = Player(pos = (obj.x * UPSCALE_FACTOR,obj.y * UPSCALE_FACTOR), 
-                                     group = self.all_sprites, #Group to store and update player sprite
-                                     collision_sprites = self.collision_sprites, #Group for handling collisions
-                                     log_sprites = self.log_sprites, #Group to track logs
-                                     rock_sprites = self.rock_sprites, #Group to track Rocks
-                                     grass_sprites = self.grass_sprites, #Group to track Grass
-                                     soil_layer = self.soil_layer, #Group to interact with soil layer
-                                     interaction_sprites = self.interaction_sprites, 
-                                     toggle_shop = self.toggle_shop, #Method to toggle shop
-                                     toggle_instructions = self.toggle_instructions) #Method to toggle instructions
-                
-        #Loads image 'NEW_MAP'
-        original_image = pygame.image.load('NEW_MAP.png').convert_alpha()
-        #Upscales the image
-        upscaled_image = pygame.transform.scale(original_image, (original_image.get_width() * 4, original_image.get_height() * 4))
-
-        #Creates Generic Object
-        Generic(
-            pos=(0, 0), #Position at (0,0)
-            surf=upscaled_image, 
-            groups=self.all_sprites, #Adds sprite to all_sprites group 
-            z=LAYERS['Land'] #Set Layer to Land
-        )
+        spawn_x, spawn_y = level_data.spawn_points['SpawnPoint']
+        #Player position is upscaled, adjusting it to the world
+        self.player = Player(pos = (spawn_x * UPSCALE_FACTOR, spawn_y * UPSCALE_FACTOR), 
+                             group = self.all_sprites, #Group to store and update player sprite
+                             collision_sprites = self.collision_sprites, #Group for handling collisions
+                             collision_grid = self.collision_grid, #Blocked tiles for handling collisions
+                             log_sprites = self.log_sprites, #Group to track logs
+                             rock_sprites = self.rock_sprites, #Group to track Rocks
+                             grass_sprites = self.grass_sprites, #Group to track Grass
+                             soil_layer = self.soil_layer, #Group to interact with soil layer
+                             interaction_sprites = self.interaction_sprites, 
+                             toggle_shop = self.toggle_shop, #Method to toggle shop
+                             toggle_instructions = self.toggle_instructions, #Method to toggle instructions
+                             controls = self.controls, #Keyboard source
+                             clock = self.clock) #Game time for the tool and seed timers
+
+        #Decorations, fences, logs, rocks, grass and the map image are loaded in chunks around the player
+        #Far away chunks are unloaded, destroyed and damaged objects stay that way when they come back
+        self.streamer = WorldStreamer(self)
+        if save:
+            restore_snapshot(self, save)
+        self.streamer.update(self.player.rect.center)
         
     def player_add(self,item): #Function to add Item
         if item == 'Wood':
@@ -148,7 +117,7 @@ class Level:
         elif item == 'Stone':
             self.player.item_inventory['Stone'] += 2
         elif item == 'Seed':
-            if random.random() <= 0.3:
+            if self.random.random() <= 0.3:
                 self.player.seed_inventory['Seed'] += 1
 
     def toggle_instructions(self): #Function to toggle instructions
@@ -162,70 +131,185 @@ class Level:
             self.player.item_inventory['Wheat'] += 1
 
     def plant_collision(self):
-        #Check if there are plants in the soil layer
-        if self.soil_layer.plant_sprites:
-            #Loop through each plant in the soil_layer's plant_sprites group
-            for plant in self.soil_layer.plant_sprites.sprites():
-                #Check if plant is harvestable and create a rectangle that collides with player's hitbox
-                if plant.harvestable and plant.rect.colliderect(self.player.hitbox):
-                    self.harvest_add('Wheat') #Adds Wheat to inventory
-                    plant.kill() #Kills item from the game
-
-                    #Creates Particle Effect
-                    Particle(pos = plant.rect.topleft,
-                             surf = plant.image,
-                             groups = self.all_sprites,
-                             z = LAYERS['Main'])
-                    
-                    #Find tile position and based it on its center
-                    tile_x = plant.rect.centerx // TILE_SIZE
-                    tile_y = plant.rect.centery // TILE_SIZE
-
-                    #Remove the plant marker 'P' from the soil grid
-                    self.soil_layer.grid[tile_y][tile_x].remove('P')
-
-                    #If there is water marked with 'W' in the soil grid at the plant's location, remove the water
-                    if 'W' in self.soil_layer.grid[tile_y][tile_x]:
-                        self.soil_layer.remove_water()
-
-    def run(self,dt):
-
-        #Draw
-        self.display_surface.fill('black') #Fill screen with a black color
-        self.all_sprites.custom_draw(self.player) #Draw all sprites
-        self.overlay.display() #Display Overlay
-
-        #Check and Update Instruction and Menu
+        #Loop through the plants on the tiles around the player's hitbox
+        for plant in self.soil_layer.plants_near(self.player.hitbox):
+            #Check if plant is harvestable and create a rectangle that collides with player's hitbox
+            if plant.harvestable and plant.rect.colliderect(self.player.hitbox):
+                self.harvest_add('Wheat') #Adds Wheat to inventory
+                plant.kill() #Kills item from the game
+
+                #Creates Particle Effect
+                self.particles.emit(plant.rect.topleft, plant.image)
+                
+                #Tile position of the soil the plant grows on, the plant image can reach into the tile above
+                tile_x = plant.soil.rect.x // TILE_SIZE
+                tile_y = plant.soil.rect.y // TILE_SIZE
+
+                #Remove the plant from its soil tile
+                self.soil_layer.remove_plant(tile_x, tile_y)
+
+                #If the soil grid is watered at the plant's location, remove the water
+                if self.soil_layer.grid.test(tile_x, tile_y, WATERED):
+                    self.soil_layer.remove_water()
+
+    def snapshot(self):
+        #Copy of the state a save holds, safe to write from another thread
+        return take_snapshot(self)
+
+    def sprite_counts(self):
+        #Sprites per group and per drawn z-layer, for the profiler
+        counts = {
+            'all': len(self.all_sprites),
+            'static': len(self.all_sprites.static_sprites),
+            'collision': len(self.collision_sprites),
+            'logs': len(self.log_sprites),
+            'rocks': len(self.rock_sprites),
+            'grass': len(self.grass_sprites),
+            'soil': len(self.soil_layer.soil_sprites),
+            'watered': len(self.soil_layer.water_sprites),
+            'plants': len(self.soil_layer.plant_sprites),
+            'particles': len(self.particles),
+            'chunks': len(self.streamer.resident),
+        }
+        for name, layer in LAYERS.items():
+            counts['layer ' + name] = len(self.all_sprites.layers[layer])
+        return counts
+
+    def update(self, dt):
+        profiler = self.profiler
+
+        #Send the actions pressed since the last update to the player, shop or instructions
+        profiler.measure('input', self.controls.dispatch, dt)
+
+        #Game time moves on and runs the timers that are due, time stands still while a menu is open
+        self.clock.paused = self.menu_open()
+        profiler.measure('timers', self.clock.advance, dt)
+
+        #Update game state normally, the game is paused while the shop or instructions are open
+        if not self.menu_open():
+            self.previous_player_pos.update(self.player.pos)
+            profiler.measure('sprites', self.all_sprites.update, dt)
+            profiler.measure('streaming', self.streamer.update, self.player.rect.center)
+            profiler.measure('crops', self.soil_layer.update)
+            profiler.measure('plant_collision', self.plant_collision)
+
+    def menu_open(self):
+        return self.shop_active or self.show_instructions
+
+    def input_context(self):
+        #Who gets the actions, the shop comes first like in draw
         if self.shop_active:
-            self.menu.update() 
-        elif self.show_instructions:    
-            self.instruction.update()
-            self.instruction.draw()
-
-        #Update game state normally
+            return 'shop'
+        if self.show_instructions:
+            return 'instructions'
+        return 'game'
+
+    def draw(self, alpha = 1):
+        profiler = self.profiler
+
+        #Draw the player, and the camera following it, between its last two positions
+        rect = self.player.rect
+        center = rect.center
+        if alpha < 1:
+            x, y = self.previous_player_pos.lerp(self.player.pos, alpha)
+            rect.center = round(x), round(y)
+
+        if self.menu_open() and self.paused_frame is not None:
+            self.display_surface.blit(self.paused_frame, (0, 0)) #World behind the menu, unchanged since it opened
         else:
-            self.all_sprites.update(dt)
-            self.plant_collision()
+            self.display_surface.fill('black') #Fill screen with a black color
+            profiler.measure('custom_draw', self.all_sprites.custom_draw, self.player) #Draw all sprites
+            self.paused_frame = self.display_surface.copy() if self.menu_open() else None
+        profiler.measure('overlay', self.overlay.display) #Display Overlay
 
-class CameraGroup(pygame.sprite.Group):
+        #Draw Instruction and Menu on top
+        if self.shop_active:
+            profiler.measure('menu', self.menu.draw)
+        elif self.show_instructions:
+            profiler.measure('menu', self.instruction.draw)
+
+        profiler.draw(self.display_surface) #Profiler overlay when it is shown
+        rect.center = center
+
+    def run(self, dt, steps = 1, alpha = 1, render = True):
+        #Update the game steps times, then draw the new state
+        for _ in range(steps):
+            self.update(dt)
+        if render:
+            self.draw(alpha)
+        self.profiler.end_frame()
+
+class CameraGroup(PendingIndex, pygame.sprite.Group):
     def __init__(self):
         super().__init__() #Initializes the sprite group base class
         self.display_surface = pygame.display.get_surface() #Get Screen Surface
         self.offset = pygame.math.Vector2() #Initialize the offset vector used for camera scrolling
-          
+
+        #Sprites bucketed per z-layer
+        self.layers = {layer: {} for layer in LAYERS.values()}
+        self.layer_order = sorted(self.layers) #Draw order, lowest layer first
+
+        #Sprites that never change, drawn from pre-rendered chunks instead of one by one
+        self.static_sprites = StaticChunkGroup()
+
+        #Objects that draw a whole layer themselves, like the animated water
+        self.renderers = []
+
+    def add_renderer(self, renderer):
+        self.renderers.append(renderer)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        for renderer in self.renderers:
+            renderer.update(*args, **kwargs)
+
+    def index(self, sprite):
+        #Place a newly added sprite into the bucket of its z-layer
+        self.layers.setdefault(sprite.z, {})[sprite] = None
+        return sprite.z
+
+    def unindex(self, sprite, layer):
+        del self.layers[layer][sprite]
+
     def custom_draw(self, player):
         #Set camera offset to center
         self.offset.x = player.rect.centerx - SCREEN_WIDTH / 2
         self.offset.y = player.rect.centery - SCREEN_HEIGHT / 2
+        offset_x, offset_y = int(self.offset.x), int(self.offset.y)
+        view_rect = pygame.Rect(offset_x, offset_y, SCREEN_WIDTH, SCREEN_HEIGHT) #Area of the world the camera sees
+
+        self.index_pending()
+        self.static_sprites.index_pending()
 
         #Loop through all sprite layers
-        for layer in LAYERS.values():
-            #Sorts in their vertical position
-            for sprite in sorted(self.sprites(), key = lambda sprite: sprite.rect.centery):
-                if sprite.z == layer: #Check if sprite is part of current layer
-                    #Copy the sprite's rect and apply the offset(simulating camera scroll)
-                    offset_rect = sprite.rect.copy()
-                    offset_rect.center -= self.offset
-                    self.display_surface.blit(sprite.image, offset_rect) #Draw sprite to new offset position
-
-    
\ No newline at end of file
+        for layer in self.layer_order:
+            #Static sprites of this layer come from the baked chunks
+            self.static_sprites.draw_layer(self.display_surface, layer, view_rect)
+            for renderer in self.renderers:
+                renderer.draw_layer(self.display_surface, layer, view_rect)
+
+            bucket = self.layers[layer]
+            if not bucket:
+                continue
+
+            #Only keep sprites inside the camera view
+            visible = view_rect.collideobjectsall(list(bucket))
+
+            #Only layers where sprites overlap each other need to be sorted in their vertical position
+            if layer in Y_SORT_LAYERS:
+                visible.sort(key = lambda sprite: sprite.rect.centery)
+                if layer in self.static_sprites.layers:
+                    self.draw_sorted_over_static(visible, layer, offset_x, offset_y)
+                    continue
+
+            #Draw every visible sprite at its offset position (simulating camera scroll)
+            self.display_surface.blits([(sprite.image, sprite.rect.move(-offset_x, -offset_y)) for sprite in visible], False)
+
+    def draw_sorted_over_static(self, visible, layer, offset_x, offset_y):
+        #The baked chunk is already on screen, so static sprites lower on the screen than a moving sprite
+        #are drawn again on top of it to keep the same overlap as a full vertical sort
+        for sprite in visible:
+            self.display_surface.blit(sprite.image, sprite.rect.move(-offset_x, -offset_y))
+            for static in self.static_sprites.occluders(layer, sprite.rect):
+                if static.rect.centery > sprite.rect.centery:
+                    self.display_surface.blit(static.image, static.rect.move(-offset_x, -offset_y))
@@ -1,6 +1,5 @@
 import pygame
 from settings import *
-from timer import Timer
 from spritelayer import *
 
 #Generic Class is for all objects that need to be sprite-based
@@ -20,67 +19,23 @@ class Interaction(Generic):
 		super().__init__(pos, surf, groups) #Calls Generic Constructor
 		self.name = name #Sets name for object
 
-class Water(Generic):
-    def __init__(self, pos, frames, groups):
-        self.frames = frames #Stores water animation frames
-        self.frame_index = 0 #Sets initial frame index to be 0, Hence, Starting at first frame
-        
-        #Calls Generic Constructor
-        super().__init__(pos = pos,
-                         surf = self.frames[self.frame_index],
-                         groups = groups,
-                         z = LAYERS['Water'])
-        
-    def animate(self,dt):
-        #Function for animating water surface, Changing frames based on dt
-        self.frame_index += 5 * dt #Increases frame index by a factor of 5 and dt
-        #5 is a scaling factor that controls how fast the frame index increases.
-        if self.frame_index >= len(self.frames): #If end of frame is reached,
-            self.frame_index = 0 #it will be reset to first frame
-        self.image = self.frames[int(self.frame_index)] #Updates sprite image to new frame
-    
-    def update(self,dt):
-        #Function to update water's animation state
-        self.animate(dt)
-
-        
-class Particle(Generic):
-    #Class Particle is for visual effects animation
-    def __init__ (self, pos, surf, groups, z, duration = 200):
-        super().__init__(pos, surf, groups, z) #Inherits from Generic Class
-        self.start_time = pygame.time.get_ticks() #Records the start time of the particle
-        self.duration = duration 
-        #Defines how long the visual effects lasts before being removed.
-
-        #Masks sprite image, allows transparency
-        mask_surf = pygame.mask.from_surface(self.image)
-        new_surf = mask_surf.to_surface() 
-        new_surf.set_colorkey((0,0,0)) #Remove black pixels
-        self.image = new_surf #Updates image with transparency
-        
-    def update(self,dt):
-        #To check if particle's time has passed
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time > self.duration:
-            self.kill() #If it does, it is killed.
-
-
 class Log_Class(Generic): 
     #Class Log_Class is for logs that can be destroyed and collected as Wood.
-    def __init__(self, pos, surf, groups, player_add):
+    def __init__(self, pos, surf, groups, player_add, particles):
         super().__init__(pos, surf, groups) #Inherits from Generic Class
         self.health = 3 #Initializes the health as 3
         self.alive = True #Log is alive as default
 
         self.player_add = player_add #Function to add item
+        self.particles = particles #Particle system showing the flash when it is destroyed
 
     def damage(self):
         self.health -= 1 #Decreases health by 1 when damaged
 
     def check_death(self):
         if self.health <= 0: #Checks if health is gone
-            Particle(self.rect.topleft, self.image, self.groups()[0], LAYERS['Main'])
-            #Calls the Particle Class
+            self.particles.emit(self.rect.topleft, self.image)
+            #Shows the particle flash
             self.alive = False #Log set as dead
             self.kill() #Removes log from game
             self.player_add('Wood') #Wood added to inventory
@@ -92,19 +47,20 @@ class Log_Class(Generic):
 
 class Rock_Class(Generic):
     #Similar to Log Class
-    def __init__(self, pos, surf, groups, player_add):
+    def __init__(self, pos, surf, groups, player_add, particles):
         super().__init__(pos, surf, groups)
         self.health = 4
         self.alive = True
 
         self.player_add = player_add
+        self.particles = particles
 
     def damage(self):
         self.health -= 1
 
     def check_death(self):
         if self.health <= 0: 
-            Particle(self.rect.topleft, self.image, self.groups()[0], LAYERS['Main'])
+            self.particles.emit(self.rect.topleft, self.image)
             self.alive = False
             self.player_add('Stone')
             self.kill()
@@ -117,19 +73,20 @@ class Rock_Class(Generic):
 
 class Grass_Class(Generic):
     #Similar to Log Class
-    def __init__(self, pos, surf, groups, player_add):
+    def __init__(self, pos, surf, groups, player_add, particles):
         super().__init__(pos, surf, groups)
         self.health = 2
         self.alive = True
 
         self.player_add = player_add
+        self.particles = particles
 
     def damage(self):
         self.health -= 1
 
     def check_death(self):
         if self.health <= 0:
-            Particle(self.rect.topleft, self.image, self.groups()[0], LAYERS['Main'])
+            self.particles.emit(self.rect.topleft, self.image)
             self.alive = False
             self.kill()
             self.player_add('Seed')
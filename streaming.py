@@ -0,0 +1,142 @@
+import pygame
+from settings import *
+from support import import_image
+from sprites import Generic, Log_Class, Rock_Class, Grass_Class
+
+#Tile layers with a sprite per tile, drawn from the static chunks and blocking movement
+STREAMED_TILE_LAYERS = ('Decorations', 'Decorations2', 'Fences')
+
+#Object groups of the destroyable nodes, with the sprite class and the Level group of each
+STREAMED_NODE_GROUPS = (('Logs', Log_Class, 'log_sprites'),
+                        ('Rocks', Rock_Class, 'rock_sprites'),
+                        ('Grass', Grass_Class, 'grass_sprites'))
+
+class WorldChunk:
+    #Sprites created for one loaded chunk
+    def __init__(self, key):
+        self.key = key
+        self.sprites = [] #Background piece and tile sprites
+        self.nodes = [] #(object id, sprite, health it started with)
+
+#WorldStreamer keeps only the part of the world around the player as sprites.
+#The map is split into square chunks, the ones near the screen are loaded and the farthest
+#ones are unloaded once more than max_chunks are resident. Destroyed and damaged nodes are
+#remembered by object id, so an unloaded chunk comes back the way it was left.
+class WorldStreamer:
+    def __init__(self, level, chunk_tiles = STREAM_CHUNK_TILES, margin = STREAM_MARGIN, max_chunks = STREAM_MAX_CHUNKS):
+        self.level = level
+        self.level_data = level.level_data
+        self.chunk_tiles = chunk_tiles #Chunk width and height in tiles
+        self.chunk_size = chunk_tiles * TILE_SIZE #Chunk width and height in world pixels
+        self.margin = margin #World pixels around the screen that are loaded
+        self.max_chunks = max_chunks #Chunks kept resident
+        self.columns = -(-self.level_data.width // chunk_tiles)
+        self.rows = -(-self.level_data.height // chunk_tiles)
+
+        #Persistent node state
+        self.destroyed = set() #Ids of destroyed nodes, never created again
+        self.health = {} #Id -> health of damaged nodes that were unloaded
+
+        self.resident = {} #(chunk_x, chunk_y) -> WorldChunk
+        self.wanted = () #Chunk range near the player at the last update
+
+        #What each chunk holds, indexed once from the level data
+        self.tiles = {} #Chunk -> [(x, y, gid)] of the streamed tile layers, in layer order
+        width = self.level_data.width
+        for name in STREAMED_TILE_LAYERS:
+            for index, gid in enumerate(self.level_data.layer(name)):
+                if gid:
+                    x, y = index % width, index // width
+                    self.tiles.setdefault((x // chunk_tiles, y // chunk_tiles), []).append((x, y, gid))
+
+        self.nodes = {} #Chunk -> [(object, sprite class, Level group name)]
+        for name, sprite_class, group_name in STREAMED_NODE_GROUPS:
+            for obj in self.level_data.objects(name):
+                key = (int(obj.x * UPSCALE_FACTOR // self.chunk_size), int(obj.y * UPSCALE_FACTOR // self.chunk_size))
+                self.nodes.setdefault(key, []).append((obj, sprite_class, group_name))
+
+        #The background is kept at its original size and scaled one chunk at a time
+        self.background = import_image('NEW_MAP.png')
+
+    def update(self, center):
+        #Load the chunks near center, then unload the farthest ones above max_chunks
+        view = pygame.Rect(0, 0, SCREEN_WIDTH + self.margin * 2, SCREEN_HEIGHT + self.margin * 2)
+        view.center = center
+        wanted = (max(view.left // self.chunk_size, 0), min((view.right - 1) // self.chunk_size, self.columns - 1),
+                  max(view.top // self.chunk_size, 0), min((view.bottom - 1) // self.chunk_size, self.rows - 1))
+        if wanted == self.wanted:
+            return
+        self.wanted = wanted
+
+        left, right, top, bottom = wanted
+        keys = [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+        for key in keys:
+            if key not in self.resident:
+                self.load_chunk(key)
+
+        if len(self.resident) > self.max_chunks:
+            center_x, center_y = center[0] / self.chunk_size - 0.5, center[1] / self.chunk_size - 0.5
+            far = sorted((key for key in self.resident if key not in keys),
+                         key = lambda key: (key[0] - center_x) ** 2 + (key[1] - center_y) ** 2, reverse = True)
+            for key in far[:len(self.resident) - self.max_chunks]:
+                self.unload_chunk(key)
+
+    def load_chunk(self, key):
+        level = self.level
+        chunk = WorldChunk(key)
+        static_groups = [level.all_sprites.static_sprites, level.collision_sprites]
+
+        #Piece of the background image under the chunk, upscaled like the rest of the world
+        source_size = self.chunk_size // UPSCALE_FACTOR
+        area = pygame.Rect(key[0] * source_size, key[1] * source_size, source_size, source_size).clip(self.background.get_rect())
+        if area.width and area.height:
+            surf = pygame.transform.scale(self.background.subsurface(area), (area.width * UPSCALE_FACTOR, area.height * UPSCALE_FACTOR))
+            chunk.sprites.append(Generic((area.x * UPSCALE_FACTOR, area.y * UPSCALE_FACTOR), surf, level.all_sprites.static_sprites, LAYERS['Land']))
+
+        #Decorations and fences, drawn from the static chunks and blocking movement
+        for x, y, gid in self.tiles.get(key, ()):
+            surf = self.level_data.get_tile_image(gid, UPSCALE_FACTOR) #Each tile is upscaled once and shared
+            chunk.sprites.append(Generic((x * NEW_TILE_SIZE_UPSCALED, y * NEW_TILE_SIZE_UPSCALED), surf, static_groups))
+
+        #Logs, rocks and grass that were not destroyed yet, with the health they were left at
+        for obj, sprite_class, group_name in self.nodes.get(key, ()):
+            if obj.id in self.destroyed:
+                continue
+            sprite = sprite_class(pos = (obj.x * UPSCALE_FACTOR, obj.y * UPSCALE_FACTOR),
+                                  surf = obj.get_image(UPSCALE_FACTOR),
+                                  groups = [level.all_sprites, level.collision_sprites, getattr(level, group_name)],
+                                  player_add = level.player_add,
+                                  particles = level.particles)
+            full_health = sprite.health
+            sprite.health = self.health.pop(obj.id, full_health)
+            chunk.nodes.append((obj.id, sprite, full_health))
+
+        #Tilled soil, water and plants of the chunk
+        level.soil_layer.load_area(key[0] * self.chunk_tiles, key[1] * self.chunk_tiles, self.chunk_tiles)
+        self.resident[key] = chunk
+
+    def unload_chunk(self, key):
+        chunk = self.resident.pop(key)
+        for sprite in chunk.sprites:
+            sprite.kill()
+        for node_id, sprite, full_health in chunk.nodes:
+            self.remember(node_id, sprite, full_health)
+            sprite.kill()
+        self.level.soil_layer.unload_area(key[0] * self.chunk_tiles, key[1] * self.chunk_tiles, self.chunk_tiles)
+
+    def remember(self, node_id, sprite, full_health):
+        if not sprite.alive: #Set to False when the node is destroyed
+            self.destroyed.add(node_id)
+        elif sprite.health != full_health:
+            self.health[node_id] = sprite.health
+
+    def node_state(self):
+        #Destroyed ids and damaged health of every node, loaded or not
+        destroyed, health = set(self.destroyed), dict(self.health)
+        for chunk in self.resident.values():
+            for node_id, sprite, full_health in chunk.nodes:
+                if not sprite.alive:
+                    destroyed.add(node_id)
+                elif sprite.health != full_health:
+                    health[node_id] = sprite.health
+        return destroyed, health
@@ -1,25 +1,81 @@
 import os  #Import the os module for file and directory operations
-import pygame  
+import pygame
+from collections import OrderedDict
+from settings import *
+
+class AssetCache:
+    #Keeps every loaded image by path so each file is read and decoded only once per process.
+    #Everyone asking for the same path gets the same Surface object, so callers must not draw onto them.
+    def __init__(self, max_bytes = None):
+        self.max_bytes = max_bytes  #Memory cap for cached surfaces, None means no limit
+        self.images = OrderedDict()  #Path -> Surface, least recently used first
+        self.folders = {}  #Folder path -> sorted image file names
+        self.size = 0  #Bytes used by the cached surfaces
+
+    def surface_size(self, surf):
+        return surf.get_width() * surf.get_height() * surf.get_bytesize()
+
+    def load_image(self, path):
+        surf = self.images.get(path)
+        if surf is None:
+            surf = pygame.image.load(path).convert_alpha()  #Load the image and convert it for better performance
+            self.store(path, surf)
+        else:
+            self.images.move_to_end(path)
+        return surf
+
+    def store(self, path, surf):
+        #Add an already loaded surface to the cache
+        if path in self.images:
+            self.size -= self.surface_size(self.images.pop(path))
+        self.images[path] = surf
+        self.size += self.surface_size(surf)
+
+        #Evict the least recently used images while above the cap, the newest one always stays
+        while self.max_bytes is not None and self.size > self.max_bytes and len(self.images) > 1:
+            _, evicted = self.images.popitem(last = False)
+            self.size -= self.surface_size(evicted)
+
+    def list_folder(self, path):
+        names = self.folders.get(path)
+        if names is None:
+            #os.walk order is not guaranteed, so files are sorted with numbered frames in numeric order
+            names = sorted((name for name in os.listdir(path)
+                            if not name.startswith('.') and os.path.isfile(path + '/' + name)),
+                           key = frame_order)
+            self.folders[path] = names
+        return names
+
+    def clear(self):
+        self.images.clear()
+        self.folders.clear()
+        self.size = 0
+
+def frame_order(name):
+    #'10.png' comes after '2.png', names that are not numbers come after the numbered ones
+    stem = name.split('.')[0]
+    return (0, int(stem), name) if stem.isdigit() else (1, 0, name)
+
+asset_cache = AssetCache(ASSET_CACHE_MAX_BYTES)  #Shared by the whole game
+
+def import_image(path):
+    return asset_cache.load_image(path)
 
 def import_folder(path):
     surface_list = []  #Initialize an empty list to hold the surfaces
 
-    #Walk through the directory at the specified path
-    for _, _, img_files in os.walk(path): 
-        for image in img_files:  #Iterate over each image file found
-            full_path = path + '/' + image  #Construct the full path to the image file
-            image_surf = pygame.image.load(full_path).convert_alpha()  #Load the image and convert it for better performance
-            surface_list.append(image_surf)  #Add the loaded surface to the list
+    #Go through the image files of the folder in frame order
+    for image in asset_cache.list_folder(path):
+        full_path = path + '/' + image  #Construct the full path to the image file
+        surface_list.append(asset_cache.load_image(full_path))  #Add the cached surface to the list
     return surface_list  #Return the list of surfaces
 
 def import_folder_dict(path):
     surface_dict = {}  #Initialize an empty dictionary to hold the surfaces
 
-    #Walk through the directory at the specified path
-    for _, __, img_files in os.walk(path):
-        for image in img_files:  #Iterate over each image file found
-            full_path = path + '/' + image  #Construct the full path to the image file
-            image_surf = pygame.image.load(full_path).convert_alpha()  #Load the image and convert it for better performance
-            surface_dict[image.split('.')[0]] = image_surf  #Use the image filename (without extension) as the key and the surface as the value
+    #Go through the image files of the folder
+    for image in asset_cache.list_folder(path):
+        full_path = path + '/' + image  #Construct the full path to the image file
+        surface_dict[image.split('.')[0]] = asset_cache.load_image(full_path)  #Use the image filename (without extension) as the key and the surface as the value
 
-    return surface_dict  
\ No newline at end of file
+    return surface_dict
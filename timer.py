@@ -1,25 +1,56 @@
-import pygame
+import heapq
+from itertools import count
+
+class GameClock:
+    #Game time in milliseconds. The level advances it by dt every update instead of reading the wall clock,
+    #so timers behave the same in a live game and in a simulation running faster than real time.
+    #Callbacks waiting for a time are kept in a heap, each advance only looks at the ones that are due.
+    #Every Level has its own clock, a level that is thrown away takes its timers with it.
+    def __init__(self):
+        self.ticks = 0
+        self.paused = False  #Time and every timer stand still while paused (shop or instructions open)
+        self.pending = []  #Heap of (due time, order, func)
+        self.order = count()  #Callbacks due at the same time run in the order they were scheduled
+
+    def schedule(self, delay, func):
+        #Call func once delay milliseconds of game time from now
+        heapq.heappush(self.pending, (self.ticks + delay, next(self.order), func))
+
+    def advance(self, dt):
+        if self.paused:
+            return
+        self.ticks += dt * 1000
+        pending = self.pending
+        while pending and pending[0][0] <= self.ticks:
+            heapq.heappop(pending)[2]()
 
 class Timer:
-    def __init__(self, duration, func=None):
+    def __init__(self, clock, duration, func=None):
+        self.clock = clock  #GameClock of the level the timer belongs to
         self.duration = duration  #Duration of the timer in milliseconds
         self.func = func  #Optional function to call when the timer expires
         self.active = False  #Flag to indicate if the timer is active
         self.start_time = 0  #Variable to store the start time of the timer
+        self.generation = 0  #Counts activations, an expiry scheduled by an older activation is ignored
 
     def activate(self):
         self.active = True  #Set the timer to active
-        self.start_time = pygame.time.get_ticks()  #Record the current time in milliseconds
+        self.start_time = self.clock.ticks  #Record the current game time in milliseconds
+        self.generation += 1
+        generation = self.generation
+        self.clock.schedule(self.duration, lambda: self.expire(generation))  #The clock calls back when it runs out
 
     def deactivate(self):
         self.active = False  #Set the timer to inactive
         self.start_time = 0  #Reset the start time
+        self.generation += 1  #Cancels the pending expiry
 
-    def update(self):
-        current_time = pygame.time.get_ticks()  #Get the current time in milliseconds
-        #Check if the elapsed time since the start time is greater than or equal to the duration
-        if current_time - self.start_time >= self.duration:             
-            if self.func and self.start_time != 0:  #If a function is set and the timer has started
+    def expire(self, generation):
+        if generation == self.generation and self.active:
+            self.deactivate()  #Deactivate first so the function can start the timer again
+            if self.func:
                 self.func()  #Call the function
-            self.deactivate()  #Deactivate the timer after the function is called
 
+    def update(self):
+        #Timers are expired by their clock now, kept so code written for polled timers still works
+        pass
@@ -1,6 +1,28 @@
 import pygame
+from collections import OrderedDict
 from settings import *
 from player import *
+from support import import_image
+
+class TextCache:
+    #Rendered text by string, so a value that is shown every frame is only rendered when it changes
+    def __init__(self, font, color, antialias = True, size = UI_TEXT_CACHE_SIZE):
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+        self.size = size  #Maximum number of strings kept
+        self.surfs = OrderedDict()  #Text -> surface, least recently used first
+
+    def render(self, text):
+        surf = self.surfs.get(text)
+        if surf is None:
+            surf = self.font.render(text, self.antialias, self.color)
+            self.surfs[text] = surf
+            if len(self.surfs) > self.size:
+                self.surfs.popitem(last = False)  #Drop the least recently used string
+        else:
+            self.surfs.move_to_end(text)
+        return surf
 
 class Overlay:
     def __init__(self, player):
@@ -10,11 +32,17 @@ class Overlay:
 
         overlay_path = 'graphics/overlay/'  #Path to the overlay graphics
         #Load tool images into a dictionary, using the player's tools as keys
-        self.tools_surf = {tool: pygame.image.load(f'{overlay_path}{tool}.png').convert_alpha() for tool in player.tools}
+        self.tools_surf = {tool: import_image(f'{overlay_path}{tool}.png') for tool in player.tools}
         #Load seed images into a dictionary, using the player's seeds as keys (currently only loading corn)
-        self.seeds_surf = {seed: pygame.image.load(f'{overlay_path}corn.png').convert_alpha() for seed in player.seeds}
+        self.seeds_surf = {seed: import_image(f'{overlay_path}corn.png') for seed in player.seeds}
 
         self.font = pygame.font.Font('font/LycheeSoda.ttf', 30)  #Load the font for displaying text
+        self.money_text = TextCache(self.font, 'Black')  #Money strings already rendered
+
+        #Money box, composed again only when the money changes
+        self.money_shown = None
+        self.money_surf = None
+        self.money_pos = None
 
     def display(self):
         #Display the currently selected seed
@@ -30,11 +58,18 @@ class Overlay:
         self.display_money() 
 
     def display_money(self):
-        #Render the money amount
-        money_text = f'${self.player.money}'  #Format the money amount as a string
-        text_surf = self.font.render(money_text, True, 'Black')  #Create a text surface for the money amount
-        text_rect = text_surf.get_rect(midbottom=(SCREEN_WIDTH - 70, SCREEN_HEIGHT - 20))  #Position it at the bottom right
-
-        # Draw a background rectangle for better visibility
-        pygame.draw.rect(self.display_surface, 'White', text_rect.inflate(10, 10), 0, 4)  #Draw a white rectangle behind the text
-        self.display_surface.blit(text_surf, text_rect)  #Draw the money text surface on the display
\ No newline at end of file
+        if self.player.money != self.money_shown:
+            self.money_shown = self.player.money
+
+            #Render the money amount
+            text_surf = self.money_text.render(f'${self.money_shown}')  #Text surface for the money amount
+            text_rect = text_surf.get_rect(midbottom=(SCREEN_WIDTH - 70, SCREEN_HEIGHT - 20))  #Position it at the bottom right
+
+            # Draw a background rectangle for better visibility
+            box_rect = text_rect.inflate(10, 10)
+            self.money_surf = pygame.Surface(box_rect.size, pygame.SRCALPHA)
+            pygame.draw.rect(self.money_surf, 'White', self.money_surf.get_rect(), 0, 4)  #White rectangle behind the text
+            self.money_surf.blit(text_surf, (text_rect.x - box_rect.x, text_rect.y - box_rect.y))
+            self.money_pos = box_rect.topleft
+
+        self.display_surface.blit(self.money_surf, self.money_pos)  #Draw the money box on the display